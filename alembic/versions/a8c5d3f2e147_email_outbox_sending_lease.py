@@ -0,0 +1,38 @@
+"""Add the email_outbox 'sending' status for leased claims
+
+Revision ID: a8c5d3f2e147
+Revises: e6b3f8d1a924
+Create Date: 2026-10-18 19:02:41.318570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c5d3f2e147'
+down_revision: Union[str, None] = 'e6b3f8d1a924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        if op.get_context().dialect.name == "postgresql":
+            # A new enum value must be committed before an index predicate can use it.
+            op.execute("ALTER TYPE emailstatusenum ADD VALUE IF NOT EXISTS 'sending'")
+        op.create_index('ix_email_outbox_sending', 'email_outbox', ['next_attempt_at'], unique=False,
+                        postgresql_where=sa.text("status = 'sending'"),
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_email_outbox_sending', table_name='email_outbox', if_exists=True,
+                      postgresql_concurrently=True)
+    # Postgres cannot drop an enum value; hand claimed rows back and leave it unused.
+    op.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'")
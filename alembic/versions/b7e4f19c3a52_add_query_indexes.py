@@ -0,0 +1,47 @@
+"""Add indexes for catalog, cart and order lookups
+
+Revision ID: b7e4f19c3a52
+Revises: a3d6e0f4b721
+Create Date: 2026-10-18 15:27:09.640371
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4f19c3a52'
+down_revision: Union[str, None] = 'a3d6e0f4b721'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_products_category_id', 'products', ['category', 'id']),
+    ('ix_products_category_price_id', 'products', ['category', 'price', 'id']),
+    ('ix_products_price_id', 'products', ['price', 'id']),
+    ('ix_products_name_id', 'products', ['name', 'id']),
+    ('ix_carts_user_id_product_id', 'carts', ['user_id', 'product_id']),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and builds
+    # without blocking writes to these tables while it runs. If a build is
+    # interrupted Postgres leaves an INVALID index behind, which IF NOT EXISTS
+    # would skip: drop it and re-run the upgrade.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,36 @@
+"""Add products.sku for bulk import upserts
+
+Revision ID: c9d1e4a7f305
+Revises: b7e4f19c3a52
+Create Date: 2026-10-18 16:02:41.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d1e4a7f305'
+down_revision: Union[str, None] = 'b7e4f19c3a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable, so existing products need no backfill; the unique index is
+    # what INSERT ... ON CONFLICT (sku) infers as its arbiter.
+    op.add_column('products', sa.Column('sku', sa.String(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_products_sku'), 'products', ['sku'], unique=True, if_not_exists=True,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_products_sku'), table_name='products', if_exists=True,
+                      postgresql_concurrently=True)
+    op.drop_column('products', 'sku')
@@ -0,0 +1,36 @@
+"""Add products.updated_at for incremental catalog exports
+
+Revision ID: d4f8a2c6e017
+Revises: c9d1e4a7f305
+Create Date: 2026-10-18 16:48:15.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8a2c6e017'
+down_revision: Union[str, None] = 'c9d1e4a7f305'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Left NULL for existing rows rather than rewriting the whole table; the
+    # application sets it on every insert and update from here on.
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_products_updated_at_id', 'products', ['updated_at', 'id'], unique=False,
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_updated_at_id', table_name='products', if_exists=True,
+                      postgresql_concurrently=True)
+    op.drop_column('products', 'updated_at')
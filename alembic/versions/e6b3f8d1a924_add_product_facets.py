@@ -0,0 +1,55 @@
+"""Add product_facets aggregate for faceted navigation
+
+Revision ID: e6b3f8d1a924
+Revises: d4f8a2c6e017
+Create Date: 2026-10-18 17:31:52.084716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3f8d1a924'
+down_revision: Union[str, None] = 'd4f8a2c6e017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The default settings.facet_price_buckets at the time of this revision. With
+# other buckets configured, run `python -m app.products.facets` afterwards.
+PRICE_BUCKETS = [0, 10, 25, 50, 100, 250, 500, 1000]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_facets',
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('price_floor', sa.Float(), nullable=False),
+    sa.Column('product_count', sa.Integer(), nullable=False),
+    sa.Column('in_stock_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category', 'price_floor')
+    )
+    products = sa.table('products', sa.column('category'), sa.column('price'), sa.column('stock'))
+    facets = sa.table('product_facets', sa.column('category'), sa.column('price_floor'),
+                      sa.column('product_count'), sa.column('in_stock_count'))
+    # Bucket in a subquery so GROUP BY names columns rather than repeating
+    # expressions whose bound literals Postgres would not match up.
+    bucketed = sa.select(
+        sa.func.coalesce(products.c.category, '').label('category'),
+        sa.case(*[(products.c.price >= edge, edge) for edge in reversed(PRICE_BUCKETS[1:])],
+                else_=PRICE_BUCKETS[0]).label('price_floor'),
+        products.c.stock,
+    ).subquery()
+    op.execute(facets.insert().from_select(
+        ['category', 'price_floor', 'product_count', 'in_stock_count'],
+        sa.select(bucketed.c.category, bucketed.c.price_floor, sa.func.count(),
+                  sa.func.sum(sa.case((bucketed.c.stock > 0, 1), else_=0)))
+        .group_by(bucketed.c.category, bucketed.c.price_floor),
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_facets')
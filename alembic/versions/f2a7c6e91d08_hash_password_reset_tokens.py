@@ -0,0 +1,41 @@
+"""Store password reset tokens hashed; index expiration_time
+
+Revision ID: f2a7c6e91d08
+Revises: e5c92a4d7b13
+Create Date: 2026-10-18 12:41:52.118630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c6e91d08'
+down_revision: Union[str, None] = 'e5c92a4d7b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Outstanding tokens were stored in the clear and live for 30 minutes;
+    # dropping them only means an in-flight reset has to be requested again.
+    op.execute("DELETE FROM password_reset_tokens")
+    with op.batch_alter_table('password_reset_tokens') as batch_op:
+        batch_op.drop_column('token')
+        batch_op.add_column(sa.Column('token_hash', sa.LargeBinary(length=32), nullable=False))
+        batch_op.create_unique_constraint('uq_password_reset_tokens_token_hash', ['token_hash'])
+        batch_op.create_index(op.f('ix_password_reset_tokens_expiration_time'), ['expiration_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM password_reset_tokens")
+    with op.batch_alter_table('password_reset_tokens') as batch_op:
+        batch_op.drop_index(op.f('ix_password_reset_tokens_expiration_time'))
+        batch_op.drop_constraint('uq_password_reset_tokens_token_hash', type_='unique')
+        batch_op.drop_column('token_hash')
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=False))
+        batch_op.create_unique_constraint('password_reset_tokens_token_key', ['token'])
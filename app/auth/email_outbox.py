@@ -0,0 +1,263 @@
+"""Transactional email outbox and its background sender.
+
+Routes call ``enqueue`` to add an ``EmailOutbox`` row to their own session, so
+the message commits (or rolls back) with the data it refers to, and then
+``outbox.notify()`` to wake the sender. The request never touches SMTP.
+
+``EmailOutboxWorker`` runs in the app lifespan. Each pass claims up to
+``email_outbox_batch_size`` due rows in one short transaction: they are
+picked with ``FOR UPDATE SKIP LOCKED`` (so several app workers can share the
+table) and marked ``sending`` with a lease of ``email_outbox_lease_seconds``
+in ``next_attempt_at``. No transaction or pooled connection is held while the
+batch goes out over one authenticated SMTP connection, kept open between
+batches; the outcomes are then recorded in a second short transaction. Rows
+whose lease runs out (the sender died mid-batch) are claimed again, or marked
+failed if that was their last attempt. Failed sends, whatever the error, are
+retried with exponential backoff up to ``email_outbox_max_attempts`` before
+the row is marked failed.
+
+For local testing point it at an aiosmtpd stand-in:
+
+    python -m aiosmtpd -n -l 127.0.0.1:8025
+    EMAIL_SERVER=127.0.0.1 EMAIL_PORT=8025 EMAIL_USE_TLS=false uvicorn main:app
+"""
+import asyncio
+import logging
+import random
+import smtplib
+import time
+from datetime import datetime, timedelta
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.email_utils import EMAIL_FROM, EMAIL_PASSWORD, EMAIL_PORT, EMAIL_SERVER, build_message
+from app.auth.models import EmailOutbox, EmailStatusEnum
+from app.core import database
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEPTH = Gauge("email_outbox_depth", "Emails waiting to be sent", multiprocess_mode="max")
+SEND_LATENCY = Histogram(
+    "email_send_seconds", "Time to hand one message to the SMTP server",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+SEND_RESULTS = Counter("email_send_total", "Email send attempts by outcome", ["result"])
+
+
+def enqueue(db, to_email: str, subject: str, body: str) -> EmailOutbox:
+    """Add a message to ``db``; it is sent once the caller commits."""
+    entry = EmailOutbox(to_email=to_email, subject=subject, body=body)
+    db.add(entry)
+    return entry
+
+
+class SMTPConnection:
+    """One authenticated SMTP session, reopened when stale or dropped."""
+
+    def __init__(self, idle_timeout: float):
+        self.idle_timeout = idle_timeout
+        self._server = None
+        self._last_used = 0.0
+
+    def _open(self):
+        server = smtplib.SMTP(EMAIL_SERVER, EMAIL_PORT, timeout=30)
+        if settings.email_use_tls:
+            server.starttls()
+        if EMAIL_PASSWORD:
+            server.login(EMAIL_FROM, EMAIL_PASSWORD)
+        return server
+
+    def _connection(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._server is None:
+            self._server = self._open()
+        return self._server
+
+    def send(self, message):
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server hung up on our pooled session; retry once on a fresh one.
+            self.close()
+            self._connection().send_message(message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class EmailOutboxWorker:
+    def __init__(self):
+        self.batch_size = settings.email_outbox_batch_size
+        self.poll_interval = settings.email_outbox_poll_interval_seconds
+        self.max_attempts = settings.email_outbox_max_attempts
+        self.lease = settings.email_outbox_lease_seconds
+        self.backoff = settings.email_outbox_backoff_seconds
+        self.smtp = SMTPConnection(settings.email_smtp_idle_seconds)
+        self._wakeup = None
+        self._task = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _retry_at(self, attempts: int) -> datetime:
+        delay = self.backoff * 2 ** (attempts - 1)
+        return datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _send_batch(self, entries):
+        """Runs in a worker thread; SMTP calls block."""
+        results = []
+        for entry in entries:
+            started = time.perf_counter()
+            try:
+                self.smtp.send(build_message(entry.to_email, entry.subject, entry.body))
+            except Exception as e:
+                # Anything else is recorded against this message alone, so the
+                # rest of the batch keeps its outcomes; the session may be
+                # mid-transaction either way.
+                if not isinstance(e, (smtplib.SMTPException, OSError)):
+                    logger.exception(f"Unexpected error sending email {entry.id}")
+                self.smtp.close()
+                results.append(str(e) or e.__class__.__name__)
+                continue
+            SEND_LATENCY.observe(time.perf_counter() - started)
+            results.append(None)
+        return results
+
+    async def _claim(self) -> list:
+        table = EmailOutbox.__table__
+        now = datetime.utcnow()
+        due = (
+            select(table.c.id)
+            # Due pending rows and expired leases; one branch per partial index.
+            .where(or_(
+                and_(table.c.status == EmailStatusEnum.pending, table.c.next_attempt_at <= now),
+                and_(table.c.status == EmailStatusEnum.sending, table.c.next_attempt_at <= now),
+            ))
+            .order_by(table.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        # Leases that ran out on the last allowed attempt: the sender never
+        # recorded a result, so the row is failed rather than claimed again.
+        exhausted = (
+            select(table.c.id)
+            .where(table.c.status == EmailStatusEnum.sending, table.c.next_attempt_at <= now,
+                   table.c.attempts >= self.max_attempts)
+            .with_for_update(skip_locked=True)
+        )
+        lease = now + timedelta(seconds=self.lease)
+        db = database.new_session()
+        try:
+            for entry in (await db.execute(
+                update(table)
+                .where(table.c.id.in_(exhausted))
+                .values(status=EmailStatusEnum.failed, last_error="lease expired without a recorded result")
+                .returning(table.c.id, table.c.to_email, table.c.attempts)
+            )).all():
+                SEND_RESULTS.labels("failed").inc()
+                logger.error(f"Giving up on email {entry.id} to {entry.to_email} after {entry.attempts} attempts: "
+                             "lease expired without a recorded result")
+            entries = (await db.execute(
+                update(table)
+                .where(table.c.id.in_(due))
+                .values(status=EmailStatusEnum.sending, next_attempt_at=lease, attempts=table.c.attempts + 1)
+                .returning(table.c.id, table.c.to_email, table.c.subject, table.c.body, table.c.attempts,
+                           table.c.next_attempt_at)
+            )).all()
+            await db.commit()
+        finally:
+            await db.close()
+        return sorted(entries, key=lambda entry: entry.id)
+
+    async def _record(self, entries, results):
+        now = datetime.utcnow()
+        outcomes = []
+        for entry, error in zip(entries, results):
+            outcome = {
+                "b_id": entry.id, "b_lease": entry.next_attempt_at, "b_status": EmailStatusEnum.sent,
+                "b_next": entry.next_attempt_at, "b_error": error, "b_sent": None,
+            }
+            if error is None:
+                outcome["b_sent"] = now
+                SEND_RESULTS.labels("sent").inc()
+                logger.info(f"Email {entry.id} sent to: {entry.to_email}")
+            elif entry.attempts >= self.max_attempts:
+                outcome["b_status"] = EmailStatusEnum.failed
+                SEND_RESULTS.labels("failed").inc()
+                logger.error(f"Giving up on email {entry.id} to {entry.to_email} after {entry.attempts} attempts: {error}")
+            else:
+                outcome["b_status"] = EmailStatusEnum.pending
+                outcome["b_next"] = self._retry_at(entry.attempts)
+                SEND_RESULTS.labels("retry").inc()
+                logger.warning(f"Email {entry.id} to {entry.to_email} failed, retrying: {error}")
+            outcomes.append(outcome)
+
+        table = EmailOutbox.__table__
+        db = database.new_session()
+        try:
+            if outcomes:
+                # Only while our lease holds: past it, another sender may have re-claimed the row.
+                await db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"), table.c.status == EmailStatusEnum.sending,
+                           table.c.next_attempt_at == bindparam("b_lease"))
+                    .values(status=bindparam("b_status"), next_attempt_at=bindparam("b_next"),
+                            last_error=bindparam("b_error"), sent_at=bindparam("b_sent")),
+                    outcomes,
+                )
+            OUTBOX_DEPTH.set(await db.scalar(
+                select(func.count()).select_from(EmailOutbox).where(EmailOutbox.status == EmailStatusEnum.pending)
+            ))
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def process_batch(self) -> int:
+        entries = await self._claim()
+        results = await run_in_threadpool(self._send_batch, entries) if entries else []
+        await self._record(entries, results)
+        return len(entries)
+
+    async def _run(self):
+        while True:
+            try:
+                sent = await self.process_batch()
+            except Exception as e:
+                logger.error(f"Email outbox pass failed: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                # Caught up: sleep until the next poll or until a route enqueues.
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.smtp.close)
+
+
+outbox = EmailOutboxWorker()
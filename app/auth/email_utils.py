@@ -11,12 +11,17 @@ EMAIL_SERVER = os.getenv("EMAIL_SERVER", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 
 
-def send_email(to_email: str, subject: str, body: str):
+def build_message(to_email: str, subject: str, body: str) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = EMAIL_FROM
     msg["To"] = to_email
     msg.set_content(body)
+    return msg
+
+
+def send_email(to_email: str, subject: str, body: str):
+    msg = build_message(to_email, subject, body)
 
     try:
         with smtplib.SMTP(EMAIL_SERVER, EMAIL_PORT) as server:
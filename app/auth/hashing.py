@@ -0,0 +1,122 @@
+"""Password hashing off the event loop, on a bounded process pool.
+
+bcrypt is deliberately CPU-bound: run inline (or on the shared threadpool) a
+burst of logins pins every core of the worker and starves unrelated requests.
+``hasher`` sends the work to a small process pool instead and caps the number
+of hashes admitted at once; past that cap callers get ``PasswordHasherBusy``
+straight away, which the auth routes turn into a 503 with ``Retry-After``.
+
+The pool is started lazily on first use with the ``spawn`` start method, so
+children never inherit the parent's open database connections or threads.
+If a child dies the executor is broken for good; it is replaced and the hash
+retried once, and a second failure is reported as ``PasswordHasherBusy``.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_size: int, retry_after: int):
+        self.workers = workers or os.cpu_count() or 1
+        # Hashes running in the pool plus those waiting for a free process.
+        self.capacity = self.workers + queue_size
+        self.retry_after = retry_after
+        self._executor = None
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+            logger.info(f"Password hashing pool started with {self.workers} processes")
+        return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        # Concurrent callers see the same broken pool; only the first replaces it.
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.warning("Password hashing pool broke; starting a new one")
+
+    async def _run(self, fn, *args):
+        executor = self._pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    async def _submit(self, fn, *args):
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise PasswordHasherBusy(self.retry_after)
+        self._in_flight += 1
+        try:
+            try:
+                result = await self._run(fn, *args)
+            except BrokenProcessPool:
+                try:
+                    result = await self._run(fn, *args)
+                except BrokenProcessPool as e:
+                    logger.error(f"Password hashing pool broke again: {e}")
+                    raise PasswordHasherBusy(self.retry_after) from e
+        finally:
+            self._in_flight -= 1
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size,
+    retry_after=settings.password_hash_retry_after_seconds,
+)
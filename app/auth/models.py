@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Boolean, LargeBinary, Text, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import enum
@@ -9,6 +9,13 @@ class RoleEnum(str, enum.Enum):
     admin = "admin"
     user = "user"
 
+class EmailStatusEnum(str, enum.Enum):
+    pending = "pending"
+    # Claimed by a sender until next_attempt_at, its lease
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -17,6 +24,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(Enum(RoleEnum), default=RoleEnum.user, nullable=False)
+    # Bumped to invalidate every access token issued before (JWT "ver" claim).
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
 
    
     carts = relationship("app.cart.models.Carts", back_populates="user")
@@ -28,7 +37,62 @@ class PasswordResetToken(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String, nullable=False, unique=True)
-    expiration_time = Column(DateTime, default=lambda: datetime.datetime.utcnow() + datetime.timedelta(minutes=30))
+    # HMAC-SHA256 of the emailed token; the raw token is never stored.
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True)
+    expiration_time = Column(DateTime, default=lambda: datetime.datetime.utcnow() + datetime.timedelta(minutes=30), index=True)
     used = Column(Boolean, default=False)
-    
+
+
+class RefreshToken(Base):
+    """One issued refresh token; only its HMAC-SHA256 digest is stored.
+
+    Every rotation inserts a successor in the same ``family_id`` and stamps
+    ``used_at`` on the predecessor. Presenting a token that was already used
+    or revoked means it leaked, so the whole family is revoked.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked = Column(Boolean, default=False, nullable=False)
+
+
+class TokenRevocation(Base):
+    """Revoked access tokens: one ``jti``, or every token of a user below ``token_version``.
+
+    Rows are append-only; each worker pulls them by ``id``, re-reading a
+    recent window since ids do not become visible in commit order. ``expires_at`` is when the last
+    token the entry could match expires, after which the row is dead weight.
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    jti = Column(String(32), nullable=True)
+    token_version = Column(Integer, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    # The sender only ever scans pending rows in due order, and claimed rows by lease expiry.
+    __table_args__ = (
+        Index("ix_email_outbox_pending", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+        Index("ix_email_outbox_sending", "next_attempt_at", postgresql_where=text("status = 'sending'")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatusEnum), default=EmailStatusEnum.pending, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
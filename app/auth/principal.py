@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from app.auth.models import RoleEnum
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Caller identity taken from the signed access-token claims alone."""
+
+    id: int
+    email: str
+    role: RoleEnum
+    token_version: int = 0
+    jti: Optional[str] = None
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        return cls(
+            id=int(payload["uid"]),
+            email=payload["sub"],
+            role=RoleEnum(payload["role"]),
+            token_version=int(payload.get("ver", 0)),
+            jti=payload.get("jti"),
+        )
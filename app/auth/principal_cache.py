@@ -0,0 +1,91 @@
+"""Caches for request authentication.
+
+Decoded JWT payloads are memoized per token string until the token expires,
+so a client reusing its token skips signature verification. Authenticated
+users are cached by token subject (email) in a local TTL/LRU cache; with
+``principal_cache_backend = "redis"`` entries are also shared through Redis
+and the local copy becomes a short-lived L1, so an invalidation in one
+worker reaches the others within ``principal_cache_local_ttl_seconds``.
+"""
+import json
+import time
+from dataclasses import asdict, dataclass
+
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError
+
+from app.auth.models import RoleEnum
+from app.core.cache import TTLCache, get_redis
+from app.core.config import settings
+
+REDIS_PREFIX = "principal:"
+
+_token_payloads = TTLCache("jwt_payloads", settings.token_cache_size)
+_users = TTLCache(
+    "principals",
+    settings.principal_cache_size,
+    ttl=settings.principal_cache_local_ttl_seconds
+    if settings.principal_cache_backend == "redis" else settings.principal_cache_ttl_seconds,
+)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    name: str
+    email: str
+    role: RoleEnum
+
+    @classmethod
+    def from_model(cls, user) -> "CachedUser":
+        return cls(id=user.id, name=user.name, email=user.email, role=RoleEnum(user.role))
+
+
+def decode_token(token: str) -> dict:
+    """``jwt.decode`` with the verified payload memoized until ``exp``."""
+    payload = _token_payloads.get(token)
+    if payload is not None:
+        if payload.get("exp") is not None and payload["exp"] <= time.time():
+            _token_payloads.delete(token)
+            raise ExpiredSignatureError("Signature has expired.")
+        return payload
+
+    payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    ttl = payload["exp"] - time.time() if payload.get("exp") is not None else None
+    _token_payloads.set(token, payload, ttl)
+    return payload
+
+
+async def get_user(email: str):
+    user = _users.get(email)
+    if user is not None:
+        return user
+
+    redis = _shared()
+    if redis is not None:
+        raw = await redis.get(REDIS_PREFIX + email)
+        if raw is not None:
+            data = json.loads(raw)
+            user = CachedUser(**{**data, "role": RoleEnum(data["role"])})
+            _users.set(email, user)
+            return user
+    return None
+
+
+async def put_user(user: CachedUser):
+    _users.set(user.email, user)
+    redis = _shared()
+    if redis is not None:
+        await redis.set(REDIS_PREFIX + user.email, json.dumps(asdict(user)), ex=int(settings.principal_cache_ttl_seconds))
+
+
+async def invalidate_user(email: str):
+    """Drop a cached principal; call after password resets and role changes."""
+    _users.delete(email)
+    redis = _shared()
+    if redis is not None:
+        await redis.delete(REDIS_PREFIX + email)
+
+
+def _shared():
+    return get_redis() if settings.principal_cache_backend == "redis" else None
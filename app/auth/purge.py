@@ -0,0 +1,65 @@
+"""Background purge of spent password-reset tokens.
+
+Every ``reset_token_purge_interval_seconds`` the purger deletes used or
+expired rows from ``password_reset_tokens`` in batches of
+``reset_token_purge_batch_size``, committing after each batch so no single
+statement holds locks on a large slice of the table. It yields to the event
+loop between batches and stops once a batch comes back short.
+"""
+import asyncio
+import logging
+
+from app.auth import utils
+from app.core import database
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResetTokenPurger:
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+        self.purged = 0
+
+    async def purge(self) -> int:
+        total = 0
+        while True:
+            db = database.new_session()
+            try:
+                deleted = await utils.purge_password_reset_tokens(db, self.batch_size)
+            finally:
+                await db.close()
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            await asyncio.sleep(0)
+        self.purged += total
+        if total:
+            logger.info(f"Purged {total} used or expired password reset tokens")
+        return total
+
+    async def _run(self):
+        while True:
+            try:
+                await self.purge()
+            except Exception as e:
+                logger.error(f"Password reset token purge failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+purger = ResetTokenPurger(settings.reset_token_purge_interval_seconds, settings.reset_token_purge_batch_size)
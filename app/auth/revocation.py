@@ -0,0 +1,212 @@
+"""Access-token revocation, checked in memory on every request.
+
+Revocations are rows in ``token_revocations``: either a single token (by
+``jti``) or every token of a user whose ``ver`` claim is below the user's new
+``token_version``. Each worker mirrors the live rows in ``revoked``: a Bloom
+filter answers "definitely not revoked" for almost every request, and only a
+filter hit is confirmed against the exact per-user / per-jti maps.
+
+The app loads the live rows before serving. A background task then pulls
+rows by ``id`` every ``revocation_refresh_interval_seconds`` and adds them to
+the filter, so revocations made by other workers take effect within that
+interval; revocations made by this worker apply immediately. Ids are handed out
+at insert but become visible at commit, so a row can appear after one with a
+higher id: each pass starts from the highest id seen
+``revocation_lookback_seconds`` earlier rather than the latest, and a row whose
+transaction commits within that window is still picked up. The filter is only
+rebuilt, from the entries still live, once the earliest entry has expired or it
+holds more keys than it was sized for.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.auth.models import TokenRevocation
+from app.auth.principal import Principal
+from app.core import database
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _user_key(user_id: int) -> str:
+    return f"u:{user_id}"
+
+
+def _jti_key(jti: str) -> str:
+    return f"j:{jti}"
+
+
+class RevocationList:
+    def __init__(self, capacity: int, error_rate: float, refresh_interval: float, lookback: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.lookback = lookback
+        self._bloom = BloomFilter(capacity, error_rate)
+        # user_id -> (minimum valid token_version, expires_at)
+        self._users = {}
+        # jti -> expires_at
+        self._jtis = {}
+        # Earliest expires_at of any entry held; None when there are none
+        self._next_expiry = None
+        self._last_id = 0
+        # (monotonic time, _last_id) before each refresh within the lookback
+        self._cursors = deque()
+        self._task = None
+        self.bloom_hits = 0
+        self.cleared_after_hit = 0
+
+    def is_revoked(self, principal: Principal) -> bool:
+        user_hit = _user_key(principal.id) in self._bloom
+        jti_hit = principal.jti is not None and _jti_key(principal.jti) in self._bloom
+        if not (user_hit or jti_hit):
+            return False
+
+        self.bloom_hits += 1
+        entry = self._users.get(principal.id) if user_hit else None
+        if entry is not None and principal.token_version < entry[0]:
+            return True
+        if jti_hit and principal.jti in self._jtis:
+            return True
+        self.cleared_after_hit += 1
+        return False
+
+    def apply(self, row: TokenRevocation):
+        if row.expires_at <= datetime.utcnow():
+            return
+        # Keys already in the filter are not re-added, so its count stays the number of entries.
+        if row.jti is not None:
+            if row.jti not in self._jtis:
+                self._bloom.add(_jti_key(row.jti))
+            self._jtis[row.jti] = row.expires_at
+        if row.token_version is not None:
+            entry = self._users.get(row.user_id)
+            if entry is None:
+                self._bloom.add(_user_key(row.user_id))
+                entry = (0, row.expires_at)
+            self._users[row.user_id] = (max(entry[0], row.token_version), max(entry[1], row.expires_at))
+        if self._next_expiry is None or row.expires_at < self._next_expiry:
+            self._next_expiry = row.expires_at
+        if self._bloom.count > self.capacity:
+            self._rebuild()
+
+    def prune(self):
+        """Rebuild the filter without expired entries, once any has expired."""
+        if self._next_expiry is not None and self._next_expiry <= datetime.utcnow():
+            self._rebuild()
+
+    def _rebuild(self):
+        now = datetime.utcnow()
+        self._users = {uid: entry for uid, entry in self._users.items() if entry[1] > now}
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        live = len(self._users) + len(self._jtis)
+        if live > self.capacity:
+            logger.warning(f"Revocation list holds {live} entries; growing Bloom filter beyond {self.capacity}")
+            self.capacity = live * 2
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for uid in self._users:
+            bloom.add(_user_key(uid))
+        for jti in self._jtis:
+            bloom.add(_jti_key(jti))
+        self._bloom = bloom
+        expiries = [entry[1] for entry in self._users.values()] + list(self._jtis.values())
+        self._next_expiry = min(expiries, default=None)
+
+    async def refresh(self, db) -> int:
+        now = time.monotonic()
+        self._cursors.append((now, self._last_id))
+        while len(self._cursors) > 1 and self._cursors[1][0] <= now - self.lookback:
+            self._cursors.popleft()
+        # Rows already applied are read again until the window passes them;
+        # applying one twice changes nothing.
+        rows = (await db.scalars(
+            select(TokenRevocation)
+            .where(TokenRevocation.id > self._cursors[0][1], TokenRevocation.expires_at > datetime.utcnow())
+            .order_by(TokenRevocation.id)
+        )).all()
+        for row in rows:
+            self.apply(row)
+            # Only rows read here advance the cursor: a row this worker just
+            # inserted may have a higher id than another worker's unseen one.
+            self._last_id = max(self._last_id, row.id)
+        return len(rows)
+
+    async def load(self):
+        """One refresh; the app awaits it before serving so no request sees an empty list."""
+        db = database.new_session()
+        try:
+            await self.refresh(db)
+            self.prune()
+        finally:
+            await db.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Failed to refresh token revocation list: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "jtis": len(self._jtis),
+            "last_id": self._last_id,
+            "bloom_capacity": self.capacity,
+            "bloom_keys": self._bloom.count,
+            "bloom_hits": self.bloom_hits,
+            "cleared_after_hit": self.cleared_after_hit,
+        }
+
+
+revoked = RevocationList(
+    settings.revocation_bloom_capacity,
+    settings.revocation_bloom_error_rate,
+    settings.revocation_refresh_interval_seconds,
+    settings.revocation_lookback_seconds,
+)
+
+
+def _expiry() -> datetime:
+    # An access token issued now is the last one a revocation can still match.
+    return datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+
+
+def revoke_user_tokens(user, db) -> TokenRevocation:
+    """Invalidate every access token issued to ``user`` so far.
+
+    Adds the revocation to the session; call ``revoked.apply`` on the returned
+    row after the caller commits.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    entry = TokenRevocation(user_id=user.id, token_version=user.token_version, expires_at=_expiry())
+    db.add(entry)
+    return entry
+
+
+def revoke_token(principal: Principal, db, expires_at: Optional[datetime] = None) -> TokenRevocation:
+    """Invalidate a single access token by its ``jti``; same commit contract as above."""
+    entry = TokenRevocation(user_id=principal.id, jti=principal.jti, expires_at=expires_at or _expiry())
+    db.add(entry)
+    return entry
@@ -1,27 +1,46 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from app.core.deps import get_db
-from app.auth import schemas, models, utils
-from app.core.deps import get_current_user
+from app.auth import schemas, models, utils, principal_cache, revocation
+from app.auth.principal import Principal
+from app.auth.hashing import hasher, PasswordHasherBusy
+from app.core.deps import get_current_user, get_principal, require_admin
 import logging
 from app.auth.schemas import ForgotPasswordRequest, ResetPasswordRequest
-from app.auth.email_utils import send_email  
+from app.auth import email_outbox
+from app.core.config import settings
+from app.core.ratelimit import RateLimiter, Rule
+from app.monitoring.query_budget import query_budget
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+admin_router = APIRouter(prefix="/admin/users", tags=["Admin Users"])
+
+signin_limit = RateLimiter(
+    "signin",
+    Rule("ip", settings.signin_ip_per_minute, settings.signin_ip_burst),
+    Rule("email", settings.signin_email_per_minute, settings.signin_email_burst),
+)
+forgot_password_limit = RateLimiter(
+    "forgot_password",
+    Rule("ip", settings.forgot_password_ip_per_minute, settings.forgot_password_ip_burst),
+    Rule("email", settings.forgot_password_email_per_minute, settings.forgot_password_email_burst),
+)
 
 
 @router.post("/signup", response_model=schemas.Token)
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db), status_code=201):
+@query_budget(3)
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_db), status_code=201):
     try:
-        existing = db.query(models.User).filter(models.User.email == user.email).first()
+        existing = await db.scalar(select(models.User).where(models.User.email == user.email))
         if existing:
             logger.warning(f"Signup failed - Email already registered: {user.email}")
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_pw = utils.hash_password(user.password)
+        hashed_pw = await hasher.hash(user.password)
         db_user = models.User(
             name=user.name,
             email=user.email,
@@ -29,17 +48,26 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db), status_code=
             role=user.role
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.flush()
+        refresh_token = utils.issue_refresh_token(db_user.id, db)
+        await db.commit()
 
         logger.info(f"User signed up successfully: {user.email}, Role: {user.role}")
-        token = utils.create_access_token({"sub": db_user.email, "role": db_user.role})
-        return {"access_token": token, "token_type": "bearer"}
+        token = utils.create_access_token(utils.token_claims(db_user))
+        return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
     except SQLAlchemyError as e:
         logger.error(f"Database error during signup: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+    except PasswordHasherBusy as e:
+        logger.warning(f"Password hashing queue full, rejecting signup: {user.email}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     except HTTPException as http_exc:
         raise http_exc
 
@@ -48,22 +76,34 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db), status_code=
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 
-@router.post("/signin", response_model=schemas.Token)
-def signin(user: schemas.UserLogin, db: Session = Depends(get_db)):
+@router.post("/signin", response_model=schemas.Token, dependencies=[Depends(signin_limit)])
+@query_budget(2)
+async def signin(user: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     try:
-        db_user = db.query(models.User).filter(models.User.email == user.email).first()
-        if not db_user or not utils.verify_password(user.password, db_user.hashed_password):
+        db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
+        if not db_user or not await hasher.verify(user.password, db_user.hashed_password):
             logger.warning(f"Failed login attempt: {user.email}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
+        refresh_token = utils.issue_refresh_token(db_user.id, db)
+        await db.commit()
+
         logger.info(f"User logged in: {db_user.email}, Role: {db_user.role}")
-        token = utils.create_access_token({"sub": db_user.email, "role": db_user.role})
-        return {"access_token": token, "token_type": "bearer"}
+        token = utils.create_access_token(utils.token_claims(db_user))
+        return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
     except SQLAlchemyError as e:
         logger.error(f"Database error during signin: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+    except PasswordHasherBusy as e:
+        logger.warning(f"Password hashing queue full, rejecting signin: {user.email}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     except HTTPException as http_exc:
         raise http_exc
 
@@ -72,8 +112,60 @@ def signin(user: schemas.UserLogin, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 
+@router.post("/refresh", response_model=schemas.Token)
+@query_budget(3)
+async def refresh(payload: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    try:
+        rotated = await utils.rotate_refresh_token(payload.refresh_token, db)
+        if rotated is None:
+            logger.warning("Refresh rejected: unknown, expired or reused refresh token")
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+        db_user, refresh_token = rotated
+        logger.info(f"Tokens refreshed for: {db_user.email}")
+        token = utils.create_access_token(utils.token_claims(db_user))
+        return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during token refresh: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.exception(f"Unexpected error in refresh: {str(e)}")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
+@router.post("/logout")
+@query_budget(1)
+async def logout(principal: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    try:
+        if principal.jti is None:
+            raise HTTPException(status_code=400, detail="Token cannot be revoked")
+        entry = revocation.revoke_token(principal, db)
+        await db.commit()
+        revocation.revoked.apply(entry)
+
+        logger.info(f"User logged out: {principal.email}")
+        return {"message": "Logged out"}
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during logout: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.exception(f"Unexpected error in logout: {str(e)}")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
 @router.get("/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+@query_budget(1)
+async def read_users_me(current_user: principal_cache.CachedUser = Depends(get_current_user)):
     try:
         logger.info(f"Current user fetched: {current_user.email}")
         return current_user
@@ -86,10 +178,11 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Error retrieving user info")
 
 
-@router.post("/forgot-password")
-def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db)):
+@router.post("/forgot-password", dependencies=[Depends(forgot_password_limit)])
+@query_budget(3)
+async def forgot_password(payload: ForgotPasswordRequest, db: AsyncSession = Depends(get_db)):
     try:
-        token = utils.create_password_reset_token(payload.email, db)
+        token = await utils.create_password_reset_token(payload.email, db)
         if not token:
             logger.warning(f"Password reset attempted for non-existent email: {payload.email}")
             raise HTTPException(status_code=404, detail="User not found")
@@ -111,11 +204,10 @@ def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db
         Your Team
         """
 
-        try:
-            send_email(payload.email, subject, body)
-            logger.info(f"Password reset email sent to: {payload.email}")
-        except Exception as e:
-            logger.error(f"Error sending email: {str(e)}")
+        email_outbox.enqueue(db, payload.email, subject, body)
+        await db.commit()
+        email_outbox.outbox.notify()
+        logger.info(f"Password reset email queued for: {payload.email}")
 
         return {"message": "If the email is registered, a reset link has been sent."}
 
@@ -132,21 +224,26 @@ def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db
 
 
 @router.post("/reset-password")
-def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db)):
+@query_budget(5)
+async def reset_password(payload: ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
     try:
-        token_entry = utils.verify_password_reset_token(payload.token, db)
-        if not token_entry:
-            logger.warning(f"Invalid or expired reset token used: {payload.token}")
+        user_id = await utils.consume_password_reset_token(payload.token, db)
+        if user_id is None:
+            logger.warning("Invalid, used or expired reset token presented")
             raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-        user = db.query(models.User).filter(models.User.id == token_entry.user_id).first()
+        user = await db.get(models.User, user_id)
         if not user:
             logger.error("Token points to a non-existent user.")
             raise HTTPException(status_code=404, detail="User not found")
 
-        user.hashed_password = utils.hash_password(payload.new_password)
-        utils.mark_token_as_used(payload.token, db)
-        db.commit()
+        user.hashed_password = await hasher.hash(payload.new_password)
+        entry = revocation.revoke_user_tokens(user, db)
+        # One transaction: the new password never lands without the old sessions revoked.
+        await utils.revoke_refresh_tokens(db, user_id=user.id)
+        await db.commit()
+        revocation.revoked.apply(entry)
+        await principal_cache.invalidate_user(user.email)
 
         logger.info(f"Password reset successful for user: {user.email}")
         return {"message": "Password reset successful"}
@@ -155,9 +252,46 @@ def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db))
         logger.error(f"Database error during password reset: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+    except PasswordHasherBusy as e:
+        logger.warning("Password hashing queue full, rejecting password reset")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     except HTTPException as http_exc:
         raise http_exc
 
     except Exception as e:
         logger.exception(f"Unexpected error in reset-password: {str(e)}")
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
+@admin_router.post("/{user_id}/logout")
+@query_budget(4)
+async def logout_user(user_id: int, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    try:
+        user = await db.get(models.User, user_id)
+        if not user:
+            logger.warning(f"Logout requested for missing user (ID: {user_id})")
+            raise HTTPException(status_code=404, detail="User not found")
+
+        entry = revocation.revoke_user_tokens(user, db)
+        await utils.revoke_refresh_tokens(db, user_id=user.id)
+        await db.commit()
+        revocation.revoked.apply(entry)
+
+        logger.info(f"Admin {admin.email} logged out user {user.email} from all sessions")
+        return {"message": "User logged out from all sessions"}
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during admin logout: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.exception(f"Unexpected error in admin logout: {str(e)}")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
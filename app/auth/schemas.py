@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 from typing import Optional
 from app.auth.models import RoleEnum
 import re
@@ -9,7 +9,8 @@ class UserCreate(BaseModel):
     password: str
     role: RoleEnum = RoleEnum.user # default role
 
-    @validator("email")
+    @field_validator("email")
+    @classmethod
     def validate_gmail(cls, value):
         pattern = r"^[a-zA-Z][a-zA-Z0-9]*@gmail\.com$"
         if not re.match(pattern, value):
@@ -24,22 +25,26 @@ class UserLogin(BaseModel):
 
 class Token(BaseModel):# jwt token generate krne ke baad client ko bhejne ke liye
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class TokenData(BaseModel):# intenal authorzation me..data token ko decode krne ke bad milta hai
     email: Optional[str] = None
     role: Optional[str] = None
 
 class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     name: str
     email: EmailStr
     role: RoleEnum
 
-    class Config:
-        orm_mode = True
-
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
 
@@ -1,15 +1,19 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 from typing import Optional
 from dotenv import load_dotenv
 from app.core.config import settings
 
+import hashlib
+import hmac
+import secrets
 import uuid
 from app.core.database import SessionLocal
-from app.auth.models import PasswordResetToken, User
+from app.auth.models import PasswordResetToken, RefreshToken, User
+from app.auth.hashing import pwd_context
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 
@@ -18,9 +22,7 @@ load_dotenv()
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
+REFRESH_TOKEN_EXPIRE_MINUTES = settings.refresh_token_expire_minutes
 
 def hash_password(password: str): 
     return pwd_context.hash(password)
@@ -30,41 +32,128 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def token_claims(user) -> dict:
+    """Claims ``require_user``/``require_admin`` authorize from without a DB lookup."""
+    return {"sub": user.email, "uid": user.id, "role": user.role, "ver": user.token_version or 0}
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     logging.getLogger(__name__).info(f"Access token created for: {data.get('sub')}")
     return encoded_jwt
 
+def hash_token(token: str) -> bytes:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).digest()
+
+
+def issue_refresh_token(user_id: int, db: AsyncSession, family_id: Optional[str] = None) -> str:
+    """Add a new refresh token to the session (caller commits); returns the raw token."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_token(token),
+        expires_at=datetime.utcnow() + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
+    ))
+    return token
+
+
+async def rotate_refresh_token(token: str, db: AsyncSession):
+    """Swap a refresh token for a successor in the same family.
+
+    Returns ``(user, new_token)``, or ``None`` when the token is unknown,
+    expired, or already spent; a spent token revokes its whole family.
+    """
+    row = (await db.execute(
+        select(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_token(token))
+    )).first()
+    if row is None:
+        return None
+    entry, user = row
+    now = datetime.utcnow()
+
+    if entry.expires_at < now:
+        return None
+
+    # Conditional update so two concurrent refreshes cannot both win.
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == entry.id, RefreshToken.used_at.is_(None), RefreshToken.revoked == False)
+        .values(used_at=now)
+    )
+    if claimed.rowcount != 1:
+        await revoke_refresh_tokens(db, family_id=entry.family_id)
+        await db.commit()
+        logging.getLogger(__name__).warning(
+            f"Refresh token reuse detected for user {user.email}; family {entry.family_id} revoked"
+        )
+        return None
+
+    new_token = issue_refresh_token(user.id, db, family_id=entry.family_id)
+    await db.commit()
+    return user, new_token
+
+
+async def revoke_refresh_tokens(db: AsyncSession, user_id: Optional[int] = None, family_id: Optional[str] = None):
+    """Revoke a user's or a family's refresh tokens in the caller's transaction; the caller commits."""
+    stmt = update(RefreshToken).where(RefreshToken.revoked == False).values(revoked=True)
+    if user_id is not None:
+        stmt = stmt.where(RefreshToken.user_id == user_id)
+    if family_id is not None:
+        stmt = stmt.where(RefreshToken.family_id == family_id)
+    await db.execute(stmt)
+
+
 def generate_reset_token():
-    return str(uuid.uuid4())
+    return secrets.token_urlsafe(32)
+
+async def create_password_reset_token(email: str, db: AsyncSession):
+    """Add a reset token for ``email`` to the session; the caller commits.
 
-def create_password_reset_token(email: str, db: Session):
-    user = db.query(User).filter(User.email == email).first()
+    Only the token's HMAC is stored; the raw token goes out in the email.
+    """
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return None
 
     token = generate_reset_token()
     reset_entry = PasswordResetToken(
         user_id=user.id,
-        token=token
+        token_hash=hash_token(token)
     )
     db.add(reset_entry)
-    db.commit()
     return token
 
-def verify_password_reset_token(token: str, db: Session):
-    entry = db.query(PasswordResetToken).filter(
-        PasswordResetToken.token == token,
-        PasswordResetToken.used == False
-    ).first()
-
-    if not entry or entry.expiration_time < datetime.utcnow():
-        return None
-    return entry
+async def consume_password_reset_token(token: str, db: AsyncSession):
+    """Mark a valid, unused, unexpired token used and return its user id, or None.
+
+    A single conditional UPDATE, so two concurrent resets cannot both consume
+    the token. The caller commits together with the password change.
+    """
+    return await db.scalar(
+        update(PasswordResetToken)
+        .where(
+            PasswordResetToken.token_hash == hash_token(token),
+            PasswordResetToken.used == False,
+            PasswordResetToken.expiration_time > datetime.utcnow(),
+        )
+        .values(used=True)
+        .returning(PasswordResetToken.user_id)
+    )
 
-def mark_token_as_used(token: str, db: Session):
-    db.query(PasswordResetToken).filter(PasswordResetToken.token == token).update({"used": True})
-    db.commit()
+async def purge_password_reset_tokens(db: AsyncSession, batch_size: int) -> int:
+    """Delete up to ``batch_size`` used or expired reset tokens; returns the count."""
+    doomed = (
+        select(PasswordResetToken.id)
+        .where(or_(PasswordResetToken.used == True, PasswordResetToken.expiration_time < datetime.utcnow()))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = await db.execute(delete(PasswordResetToken).where(PasswordResetToken.id.in_(doomed)))
+    await db.commit()
+    return result.rowcount
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class Carts(Base):
     __tablename__ = "carts"
+    __table_args__ = (Index("ix_carts_user_id_product_id", "user_id", "product_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
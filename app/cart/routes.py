@@ -1,19 +1,25 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
 from app.core.deps import get_db, require_user
+from app.core.serialization import trusted_response
 from app.cart import models, schemas
 from app.products.models import Product
+from app.monitoring.query_budget import query_budget
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 logger = logging.getLogger(__name__)
 
 
 @router.post("/add", response_model=schemas.CartItemOut, status_code=status.HTTP_201_CREATED)
-def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(4)
+async def add_to_cart(item: schemas.CartItemCreate, db: AsyncSession = Depends(get_db), current_user=Depends(require_user)):
     try:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = await db.get(Product, item.product_id)
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
         
@@ -23,7 +29,9 @@ def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), cur
                 detail=f"'{product.name}' is currently out of stock."
         )
 
-        existing = db.query(models.Carts).filter_by(user_id=current_user.id, product_id=item.product_id).first()
+        existing = await db.scalar(
+            select(models.Carts).filter_by(user_id=current_user.id, product_id=item.product_id)
+        )
         existing_quantity = existing.quantity if existing else 0
         new_quantity = existing_quantity + item.quantity
 
@@ -47,15 +55,15 @@ def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), cur
             )
             db.add(existing)
 
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
         logger.info(f"User {current_user.id} added product {product.id} to cart with quantity {existing.quantity}")
         return existing
 
     except HTTPException as e:
         raise e
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         logger.exception("Database error while adding to cart")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
     except Exception:
@@ -63,10 +71,42 @@ def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), cur
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unexpected error occurred")
 
 
-@router.get("", response_model=list[schemas.CartItemOut])
-def view_cart(db: Session = Depends(get_db), current_user=Depends(require_user)):
+@router.get("", response_model=list[schemas.CartItemDetailOut])
+@query_budget(1)
+async def view_cart(db: AsyncSession = Depends(get_db), current_user=Depends(require_user)):
     try:
-        cart_items = db.query(models.Carts).filter_by(user_id=current_user.id).all()
+        if settings.trusted_output:
+            rows = (await db.execute(
+                select(
+                    models.Carts.id, models.Carts.product_id, models.Carts.quantity,
+                    Product.name, Product.price, Product.stock, Product.image_url,
+                )
+                .join(Product, Product.id == models.Carts.product_id)
+                .where(models.Carts.user_id == current_user.id)
+            )).all()
+            logger.info(f"User {current_user.id} viewed their cart with {len(rows)} items")
+            return trusted_response(schemas.CartItemDetailOut, [
+                {
+                    "id": row.id,
+                    "product_id": row.product_id,
+                    "quantity": row.quantity,
+                    "product": {
+                        "id": row.product_id,
+                        "name": row.name,
+                        "price": row.price,
+                        "stock": row.stock,
+                        "image_url": row.image_url,
+                    },
+                }
+                for row in rows
+            ])
+
+        # Products are joined in so clients don't fetch them one by one.
+        cart_items = (await db.scalars(
+            select(models.Carts)
+            .options(joinedload(models.Carts.product))
+            .filter_by(user_id=current_user.id)
+        )).all()
         logger.info(f"User {current_user.id} viewed their cart with {len(cart_items)} items")
         return cart_items
     except HTTPException as e:
@@ -80,21 +120,22 @@ def view_cart(db: Session = Depends(get_db), current_user=Depends(require_user))
 
 
 @router.put("/{item_id}", response_model=schemas.CartItemOut)
-def update_cart_item(item_id: int, payload: schemas.CartItemUpdate, db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(3)
+async def update_cart_item(item_id: int, payload: schemas.CartItemUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(require_user)):
     try:
-        item = db.query(models.Carts).filter_by(id=item_id, user_id=current_user.id).first()
+        item = await db.scalar(select(models.Carts).filter_by(id=item_id, user_id=current_user.id))
         if not item:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
         item.quantity = payload.quantity
-        db.commit()
-        db.refresh(item)
+        await db.commit()
+        await db.refresh(item)
         logger.info(f"User {current_user.id} updated cart item {item_id} to quantity {item.quantity}")
         return item
     except HTTPException as e:
         raise e
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         logger.exception("Database error while updating cart item")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
     except Exception:
@@ -103,21 +144,22 @@ def update_cart_item(item_id: int, payload: schemas.CartItemUpdate, db: Session
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_200_OK)
-def remove_cart_item(item_id: int, db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(2)
+async def remove_cart_item(item_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(require_user)):
     try:
-        item = db.query(models.Carts).filter_by(id=item_id, user_id=current_user.id).first()
+        item = await db.scalar(select(models.Carts).filter_by(id=item_id, user_id=current_user.id))
         if not item:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
-        db.delete(item)
-        db.commit()
+        await db.delete(item)
+        await db.commit()
         logger.info(f"User {current_user.id} removed cart item {item_id}")
         return {"message": "Item removed from cart"}
 
     except HTTPException as e:
         raise e
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         logger.exception("Database error while deleting cart item")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
     except Exception:
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class CartItemBase(BaseModel):
@@ -12,9 +12,22 @@ class CartItemUpdate(BaseModel):
     quantity: int
 
 class CartItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     product_id: int
     quantity: int
 
-    class Config:
-        orm_mode = True
+
+class CartProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    price: float
+    stock: int
+    image_url: Optional[str] = None
+
+
+class CartItemDetailOut(CartItemOut):
+    product: CartProductOut
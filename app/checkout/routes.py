@@ -1,12 +1,15 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from app.core.deps import get_db, require_user
 from app.orders import models as order_models
 from app.cart import models as cart_models
+from app.products import autocomplete, facets
 from app.products.models import Product
+from app.monitoring.query_budget import query_budget
 from enum import Enum
 
 router = APIRouter(prefix="/checkout", tags=["checkout"])
@@ -19,17 +22,30 @@ class OrderStatus(str, Enum):
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-def checkout(db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(8)
+async def checkout(db: AsyncSession = Depends(get_db), current_user=Depends(require_user)):
     try:
-        cart_items = db.query(cart_models.Carts).filter_by(user_id=current_user.id).all()
+        cart_items = (await db.scalars(select(cart_models.Carts).filter_by(user_id=current_user.id))).all()
         if not cart_items:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
 
         total_amount = 0
         order_items = []
 
+        # Lock every product in the cart with one statement, in id order so
+        # concurrent checkouts sharing products cannot deadlock.
+        product_ids = sorted({item.product_id for item in cart_items})
+        products = {
+            product.id: product
+            for product in await db.scalars(
+                select(Product).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+            )
+        }
+
+        # Only products that sell out move a facet's in-stock count.
+        facet_changes = facets.FacetChanges()
         for item in cart_items:
-            product = db.query(Product).filter(Product.id == item.product_id).with_for_update().first()
+            product = products.get(item.product_id)
             if not product:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -42,7 +58,9 @@ def checkout(db: Session = Depends(get_db), current_user=Depends(require_user)):
                     detail=f"Not enough stock for Product ID {item.product_id}"
                 )
 
+            facet_changes.remove(product.category, product.price, product.stock)
             product.stock -= item.quantity
+            facet_changes.add(product.category, product.price, product.stock)
             total_amount += product.price * item.quantity
 
             order_item = order_models.OrderItem(
@@ -63,10 +81,12 @@ def checkout(db: Session = Depends(get_db), current_user=Depends(require_user)):
         db.add(order)
 
         for item in cart_items:
-            db.delete(item)
+            await db.delete(item)
 
-        db.commit()
-        db.refresh(order)
+        await facet_changes.apply(db)
+        await db.commit()
+        for item in order_items:
+            autocomplete.index.record_sale(item.product_id, item.quantity)
 
         logger.info(f"User {current_user.id} completed checkout for order {order.id} with total {total_amount}")
 
@@ -80,7 +100,7 @@ def checkout(db: Session = Depends(get_db), current_user=Depends(require_user)):
                     "quantity": item.quantity,
                     "price_at_purchase": item.price_at_purchase
                 }
-                for item in order.items
+                for item in order_items
             ],
             "status": order.status
         }
@@ -89,7 +109,7 @@ def checkout(db: Session = Depends(get_db), current_user=Depends(require_user)):
         raise http_exc
 
     except SQLAlchemyError as db_err:
-        db.rollback()
+        await db.rollback()
         logger.exception("Database error during checkout")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
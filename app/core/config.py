@@ -1,13 +1,140 @@
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Optional explicit async DSN; derived from DATABASE_URL when unset.
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # "sync": psycopg2 engine, session calls run in the threadpool.
+    # "async": asyncpg/aiosqlite engine with a native AsyncSession.
+    db_mode: str = "sync"
+
+    # Read replica for catalog / order-history reads; unset routes reads to the primary.
+    READ_DATABASE_URL: Optional[str] = None
+    replica_max_lag_seconds: float = 5.0
+    replica_check_interval_seconds: float = 1.0
+    replica_retry_after_seconds: float = 30.0
+
+    # Connection pool (ignored for in-memory SQLite).
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_use_lifo: bool = False
+
+    # "off", "warn" (log) or "raise" when a request exceeds its route's SQL budget.
+    query_budget_mode: str = "off"
+    query_budget_repeat_threshold: int = 3
+
+    # Serialize catalog/cart/order-history rows straight from column tuples,
+    # skipping ORM instances and response-model re-validation.
+    trusted_output: bool = True
+
+    # Listing total-count estimates (X-Total-Count-Estimate) are cached this long.
+    count_estimate_ttl_seconds: float = 30.0
+
+    # Public catalog read-through cache (product detail and listing pages).
+    # Writes invalidate this worker at once; other workers within the TTL.
+    catalog_cache_size: int = 2048
+    catalog_cache_ttl_seconds: float = 30.0
+
+    # Bulk product import: rows per INSERT ... ON CONFLICT batch, and how many
+    # per-row errors the report lists before truncating.
+    product_import_batch_size: int = 1000
+    product_import_max_errors: int = 1000
+    # Largest item list PATCH /admin/products/batch accepts in one request.
+    product_batch_max_items: int = 5000
+
+    # Lower edges of the /products/facets price histogram; the last bucket is
+    # open-ended. After changing them run `python -m app.products.facets`.
+    facet_price_buckets: List[float] = [0, 10, 25, 50, 100, 250, 500, 1000]
+
+    # Catalog export: rows fetched per server-side cursor round trip, and the
+    # gzip level used when the client sends Accept-Encoding: gzip.
+    catalog_export_batch_size: int = 2000
+    catalog_export_gzip_level: int = 6
+    # Incremental exports re-send rows stamped up to this long before
+    # updated_since, covering rows that committed or replicated late.
+    catalog_export_overlap_seconds: float = 300.0
+
+    # Product search: "postgres" (tsvector + GIN), "memory" (in-process
+    # inverted index, single-process dev) or "auto" to pick by dialect.
+    search_backend: str = "auto"
+    search_max_page_size: int = 100
+
+    # /products/autocomplete: in-process prefix index over product names,
+    # rebuilt from the database this often to pick up other workers' writes,
+    # and an LRU of recent results dropped by writes to products they could match.
+    autocomplete_max_limit: int = 20
+    autocomplete_rebuild_interval_seconds: float = 600.0
+    autocomplete_cache_size: int = 4096
+    autocomplete_cache_ttl_seconds: float = 60.0
+
+    # Optional shared cache backend for multi-worker deployments.
+    REDIS_URL: Optional[str] = None
+
+    # Authenticated-principal and decoded-JWT caches.
+    principal_cache_backend: str = "memory"  # "memory" or "redis"
+    principal_cache_ttl_seconds: float = 300.0
+    principal_cache_local_ttl_seconds: float = 5.0
+    principal_cache_size: int = 10000
+    token_cache_size: int = 10000
+
+    # bcrypt process pool: 0 workers means one per CPU. Requests beyond
+    # workers + queue size are rejected with 503 instead of queueing.
+    password_hash_workers: int = 0
+    password_hash_queue_size: int = 32
+    password_hash_retry_after_seconds: int = 1
+
+    # Access-token revocation list, mirrored in every worker and topped up
+    # from the token_revocations table every refresh interval.
+    revocation_refresh_interval_seconds: float = 2.0
+    # Each refresh re-reads ids seen this long ago, for rows whose transaction
+    # committed after one holding a higher id.
+    revocation_lookback_seconds: float = 60.0
+    revocation_bloom_capacity: int = 100000
+    revocation_bloom_error_rate: float = 0.001
+
+    # Background deletion of used/expired password-reset tokens.
+    reset_token_purge_interval_seconds: float = 300.0
+    reset_token_purge_batch_size: int = 1000
+
+    # Token-bucket throttling of signin / forgot-password, per client IP and
+    # per submitted email. "memory" keeps buckets per process; "redis" shares
+    # them across workers through REDIS_URL.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_shards: int = 16
+    rate_limit_max_keys: int = 100000
+    # Only behind a proxy that sets X-Forwarded-For itself.
+    rate_limit_trust_forwarded_for: bool = False
+    signin_ip_per_minute: float = 30.0
+    signin_ip_burst: int = 10
+    signin_email_per_minute: float = 5.0
+    signin_email_burst: int = 5
+    forgot_password_ip_per_minute: float = 5.0
+    forgot_password_ip_burst: int = 5
+    forgot_password_email_per_minute: float = 1.0
+    forgot_password_email_burst: int = 2
 
     email_from: str
     email_password: str
     email_server: str
     email_port: int
+    email_use_tls: bool = True
+    # Background outbox sender: rows per batch, idle poll interval, and
+    # retry policy (backoff doubles per attempt). Claimed rows go back to
+    # other senders if not settled within email_outbox_lease_seconds. Pooled
+    # SMTP sessions are reopened after email_smtp_idle_seconds without traffic.
+    email_outbox_batch_size: int = 50
+    email_outbox_poll_interval_seconds: float = 5.0
+    email_outbox_lease_seconds: float = 300.0
+    email_outbox_max_attempts: int = 5
+    email_outbox_backoff_seconds: float = 30.0
+    email_smtp_idle_seconds: float = 60.0
 
  
     secret_key: str
@@ -1,12 +1,214 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings   
+from app.core.replica import ReplicaMonitor, is_disconnect
+from app.monitoring import metrics, pool as pool_monitor
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in ``url`` for its async counterpart."""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def pool_options(url: str, use_async: bool = False) -> dict:
+    """Pool arguments from ``settings`` for a QueuePool-backed engine."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": pool_monitor.InstrumentedAsyncQueuePool if use_async else pool_monitor.InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_use_lifo": settings.db_pool_use_lifo,
+    }
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL))
+pool_monitor.instrument(engine, "primary")
+metrics.instrument_engine(engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_mode == "async":
+    _async_url = settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(_async_url, **pool_options(_async_url, use_async=True))
+    pool_monitor.instrument(async_engine, "primary_async")
+    metrics.instrument_engine(async_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+SQLALCHEMY_READ_DATABASE_URL = settings.READ_DATABASE_URL
+
+read_engine = None
+ReadSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+replica_monitor = None
+if SQLALCHEMY_READ_DATABASE_URL:
+    read_engine = create_engine(SQLALCHEMY_READ_DATABASE_URL, **pool_options(SQLALCHEMY_READ_DATABASE_URL))
+    pool_monitor.instrument(read_engine, "replica")
+    metrics.instrument_engine(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine)
+    if settings.db_mode == "async":
+        _async_read_url = to_async_url(SQLALCHEMY_READ_DATABASE_URL)
+        async_read_engine = create_async_engine(_async_read_url, **pool_options(_async_read_url, use_async=True))
+        pool_monitor.instrument(async_read_engine, "replica_async")
+        metrics.instrument_engine(async_read_engine)
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+    replica_monitor = ReplicaMonitor(
+        read_engine.dialect.name,
+        max_lag=settings.replica_max_lag_seconds,
+        check_interval=settings.replica_check_interval_seconds,
+        retry_after=settings.replica_retry_after_seconds,
+    )
 
 Base = declarative_base()
+
+
+def new_session():
+    """Open a primary session matching ``settings.db_mode``."""
+    if AsyncSessionLocal is not None:
+        return AsyncSessionLocal()
+    return ThreadedSession(SessionLocal())
+
+
+def upsert_insert(table):
+    """Dialect ``insert(table)`` supporting ``on_conflict_do_update`` (PostgreSQL, SQLite)."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    raise RuntimeError(f"INSERT ... ON CONFLICT is not supported on {engine.dialect.name}")
+
+
+def new_read_session():
+    """Open a replica session, or ``None`` when no replica is configured."""
+    if AsyncReadSessionLocal is not None:
+        return AsyncReadSessionLocal()
+    if ReadSessionLocal is not None:
+        return ThreadedSession(ReadSessionLocal())
+    return None
+
+
+async def open_read_session():
+    """Session for reads: the replica when configured and healthy, else the primary."""
+    db = new_read_session()
+    if db is not None:
+        if await replica_monitor.usable(db):
+            return ReplicaSession(db)
+        await db.close()
+    return new_session()
+
+
+class ThreadedSession:
+    """AsyncSession-compatible facade over a sync ``Session``.
+
+    Used when ``settings.db_mode == "sync"`` so route handlers share one async
+    code path; every blocking call is pushed to the threadpool.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+class ReplicaSession:
+    """Read-only facade over a replica session that moves to the primary if the replica drops.
+
+    A statement failing with a connection error marks the replica down and
+    is re-run, like every later one, on a fresh primary session.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._on_primary = False
+
+    async def _run(self, method: str, *args, **kwargs):
+        try:
+            return await getattr(self.session, method)(*args, **kwargs)
+        except DBAPIError as e:
+            if self._on_primary or not is_disconnect(e):
+                raise
+            replica_monitor.mark_down(e)
+            try:
+                await self.session.close()
+            except DBAPIError:
+                pass
+            self.session = new_session()
+            self._on_primary = True
+            return await getattr(self.session, method)(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._run("execute", *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._run("scalar", *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._run("scalars", *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._run("get", *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        return await self._run("stream", *args, **kwargs)
+
+    async def close(self):
+        await self.session.close()
@@ -1,12 +1,13 @@
 import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from jose import JWTError
 
-from app.core.database import SessionLocal
-from app.core.config import settings
-from app.auth import models
+from app.core import database
+from app.auth import models, principal_cache, revocation
+from app.auth.principal import Principal
 
  
 logger = logging.getLogger(__name__)
@@ -16,44 +17,70 @@ logging.basicConfig(level=logging.INFO)
 security = HTTPBearer()
 
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    db = database.new_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> models.User:
-    token = credentials.credentials
-    credentials_exception = HTTPException(
+async def get_read_db():
+    """Session for read-only routes: the replica when healthy, else the primary."""
+    db = await database.open_read_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+async def get_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Authenticate from the signed token claims and the in-memory revocation list; no database access."""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            logger.warning("JWT decode failed: 'sub' not found in payload")
-            raise credentials_exception
+        payload = principal_cache.decode_token(credentials.credentials)
+        principal = Principal.from_claims(payload)
     except JWTError as e:
         logger.warning(f"JWT error: {e}")
-        raise credentials_exception
+        raise _credentials_exception()
+    except (KeyError, ValueError, TypeError):
+        logger.warning("JWT rejected: missing or malformed uid/sub/role claims")
+        raise _credentials_exception()
+
+    if revocation.revoked.is_revoked(principal):
+        logger.warning(f"Revoked token presented for user: {principal.email}")
+        raise _credentials_exception()
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_db)
+) -> principal_cache.CachedUser:
+    """Load the full user record; only for routes that need more than the claims."""
+    email = principal.email
+    user = await principal_cache.get_user(email)
+    if user is not None:
+        return user
 
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+    db_user = await db.scalar(select(models.User).where(models.User.email == email))
+    if db_user is None:
         logger.warning(f"Authentication failed: User with email '{email}' not found")
-        raise credentials_exception
+        raise _credentials_exception()
 
+    user = principal_cache.CachedUser.from_model(db_user)
+    await principal_cache.put_user(user)
     return user
 
 
-def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def require_admin(current_user: Principal = Depends(get_principal)) -> Principal:
     if current_user.role != models.RoleEnum.admin:
         logger.warning(f"Admin access denied for user: {current_user.email}")
         raise HTTPException(
@@ -63,7 +90,7 @@ def require_admin(current_user: models.User = Depends(get_current_user)) -> mode
     return current_user
 
 
-def require_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def require_user(current_user: Principal = Depends(get_principal)) -> Principal:
     if current_user.role != models.RoleEnum.user:
         logger.warning(f"User-level access denied for user: {current_user.email}")
         raise HTTPException(
@@ -0,0 +1,89 @@
+"""Keyset (cursor) pagination and cheap total-count estimates.
+
+Listings stay plain JSON arrays for compatibility; pagination metadata goes in
+response headers:
+
+* ``X-Next-Cursor``: opaque cursor for the page after this one, present
+  whenever the page came back full. Pass it back as ``?cursor=`` to continue
+  with a keyset seek on ``(sort column, id)`` instead of an OFFSET scan.
+* ``X-Total-Count-Estimate``: approximate number of matching rows. On
+  PostgreSQL this is the planner's row estimate from ``EXPLAIN``, never a
+  ``COUNT(*)``; other databases fall back to counting. Estimates are cached
+  for ``count_estimate_ttl_seconds`` per distinct filter set.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+
+from app.core import database
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_ESTIMATE_HEADER = "X-Total-Count-Estimate"
+
+_estimates = TTLCache("count_estimates", 1024, ttl=settings.count_estimate_ttl_seconds)
+
+
+def encode_cursor(sort_key, values) -> str:
+    raw = json.dumps([sort_key, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key, size: int) -> list:
+    """Key values stored in ``cursor``; 400 if it is malformed or from another sort order."""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        decoded = None
+    if not isinstance(decoded, list) or len(decoded) != size + 1 or decoded[0] != sort_key:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return decoded[1:]
+
+
+def seek(query, columns, values):
+    """Restrict ``query`` to rows strictly after ``values`` in ``columns`` order."""
+    if len(columns) == 1:
+        return query.where(columns[0] > values[0])
+    return query.where(tuple_(*columns) > tuple_(*values))
+
+
+def next_cursor(sort_key, rows, key_attrs, page_size: int):
+    if len(rows) < page_size:
+        return None
+    last = rows[-1]
+    return encode_cursor(sort_key, [getattr(last, attr) for attr in key_attrs])
+
+
+async def estimate_count(db, query) -> int:
+    """Approximate row count of ``query`` (filters only; ordering and limits are ignored)."""
+    query = query.order_by(None).limit(None).offset(None)
+    if database.engine.dialect.name == "postgresql":
+        sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        cached = _estimates.get(sql)
+        if cached is None:
+            # Escape colons so literals such as 'a:b' are not read as bind parameters.
+            plan = await db.scalar(text("EXPLAIN (FORMAT JSON) " + sql.replace(":", r"\:")))
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            cached = int(plan[0]["Plan"]["Plan Rows"])
+            _estimates.set(sql, cached)
+        return cached
+
+    count_query = select(func.count()).select_from(query.subquery())
+    key = str(count_query.compile(compile_kwargs={"literal_binds": True}))
+    cached = _estimates.get(key)
+    if cached is None:
+        cached = await db.scalar(count_query)
+        _estimates.set(key, cached)
+    return cached
+
+
+def headers(cursor, estimate) -> dict:
+    result = {TOTAL_ESTIMATE_HEADER: str(estimate)}
+    if cursor is not None:
+        result[NEXT_CURSOR_HEADER] = cursor
+    return result
@@ -0,0 +1,237 @@
+"""Token-bucket rate limiting for expensive, abusable endpoints.
+
+A ``RateLimiter`` is a FastAPI dependency holding one or more ``Rule``s, each
+a bucket keyed by client IP or by the ``email`` field of the JSON body. Put it
+in the route decorator's ``dependencies`` so it runs before the handler, and
+so before any bcrypt or SMTP work. A request needs a token from every bucket:
+all of them are checked first and tokens are only taken when every one has
+one, so a request rejected by one rule does not spend the others' budget.
+Otherwise it gets a 429 with ``Retry-After`` set to when the emptiest bucket
+refills.
+
+Buckets live in a ``ShardedBucketStore`` (per-process, lock striped by key
+hash) unless ``rate_limit_backend = "redis"``, in which case one atomic Lua
+script per check keeps them in Redis so every worker shares the same budget.
+If Redis is unreachable the in-process store takes over for that check. A
+limiter's keys share a Redis hash tag, so the script can touch all of them.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from prometheus_client import Counter
+
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "ratelimit:"
+
+DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate-limit checks by limiter, rule and outcome",
+    ["limiter", "rule", "decision"],
+)
+
+# name -> RateLimiter, for /internal/rate-limits
+REGISTRY = {}
+
+# KEYS: one bucket per rule; ARGV: now, then rate and burst per key.
+# Returns each bucket's seconds until it has a token (0 when it has one).
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local tokens, waits, allowed = {}, {}, true
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local ts = tonumber(state[2]) or now
+    tokens[i] = math.min(burst, (tonumber(state[1]) or burst) + math.max(0, now - ts) * rate)
+    if tokens[i] >= 1 then
+        waits[i] = '0'
+    else
+        waits[i] = tostring((1 - tokens[i]) / rate)
+        allowed = false
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    if allowed then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+end
+return waits
+"""
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [tokens, last refill (monotonic)]
+        self.buckets = {}
+
+
+class ShardedBucketStore:
+    """In-process token buckets, striped over ``shards`` independently locked dicts."""
+
+    def __init__(self, shards: int, max_keys: int):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self.max_keys_per_shard = max(1, max_keys // len(self._shards))
+
+    def take_all(self, requests: list) -> list:
+        """Take one token from each ``(key, rate, burst)`` bucket, or from none if any is empty.
+
+        Returns each bucket's seconds until it has a token, 0 when it has one.
+        """
+        shards = [self._shards[hash(key) % len(self._shards)] for key, _, _ in requests]
+        # Locks in a fixed order, so two multi-bucket checks cannot deadlock.
+        locks = [shard.lock for shard in sorted(set(shards), key=id)]
+        now = time.monotonic()
+        for lock in locks:
+            lock.acquire()
+        try:
+            buckets, waits = [], []
+            for shard, (key, rate, burst) in zip(shards, requests):
+                bucket = shard.buckets.get(key)
+                if bucket is None:
+                    if len(shard.buckets) >= self.max_keys_per_shard:
+                        self._evict(shard, now, rate, burst)
+                    bucket = shard.buckets[key] = [burst, now]
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                buckets.append(bucket)
+                waits.append(0.0 if bucket[0] >= 1 else (1 - bucket[0]) / rate)
+            allowed = not any(waits)
+            for shard, (key, _, _), bucket in zip(shards, requests, buckets):
+                if allowed:
+                    bucket[0] -= 1
+                # An eviction for a later key may have dropped an earlier one.
+                shard.buckets[key] = bucket
+            return waits
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        return self.take_all([(key, rate, burst)])[0]
+
+    def _evict(self, shard, now, rate, burst):
+        # Buckets idle long enough to have refilled carry no state worth keeping.
+        idle = burst / rate
+        for key in [k for k, (_, ts) in shard.buckets.items() if now - ts >= idle]:
+            del shard.buckets[key]
+        if len(shard.buckets) >= self.max_keys_per_shard:
+            # Still full of active keys: drop the oldest half rather than grow.
+            for key, _ in sorted(shard.buckets.items(), key=lambda kv: kv[1][1])[: len(shard.buckets) // 2]:
+                del shard.buckets[key]
+
+    def __len__(self):
+        return sum(len(s.buckets) for s in self._shards)
+
+
+_store = ShardedBucketStore(settings.rate_limit_shards, settings.rate_limit_max_keys)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """``per_minute`` sustained requests per key, with bursts of up to ``burst``."""
+
+    key: str  # "ip" or "email"
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+
+def client_ip(request: Request) -> str:
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _body_email(request: Request) -> Optional[str]:
+    # FastAPI has already read the body for the route; this hits the cached bytes.
+    try:
+        payload = json.loads(await request.body() or b"null")
+    except ValueError:
+        return None
+    email = payload.get("email") if isinstance(payload, dict) else None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+class RateLimiter:
+    def __init__(self, name: str, *rules: Rule):
+        self.name = name
+        self.rules = rules
+        self.allowed = 0
+        self.rejected = 0
+        REGISTRY[name] = self
+
+    async def _take_all(self, checks: list) -> list:
+        """Per-rule waits for ``(rule, value)`` pairs; tokens are taken only if all are 0."""
+        if settings.rate_limit_backend == "redis":
+            redis = get_redis()
+            if redis is not None:
+                keys = [f"{REDIS_PREFIX}{{{self.name}}}:{rule.key}:{value}" for rule, value in checks]
+                args = [time.time()]
+                for rule, _ in checks:
+                    args += [rule.rate, rule.burst]
+                try:
+                    return [float(wait) for wait in await redis.eval(_TOKEN_BUCKET_LUA, len(keys), *keys, *args)]
+                except Exception as e:
+                    logger.warning(f"Redis rate limit check failed, using local buckets: {e}")
+        return _store.take_all([(f"{self.name}:{rule.key}:{value}", rule.rate, rule.burst) for rule, value in checks])
+
+    async def __call__(self, request: Request):
+        if not settings.rate_limit_enabled:
+            return
+        checks = []
+        for rule in self.rules:
+            value = client_ip(request) if rule.key == "ip" else await _body_email(request)
+            if value is not None:
+                checks.append((rule, value))
+        retry_after = 0.0
+        if checks:
+            waits = await self._take_all(checks)
+            for (rule, _), wait in zip(checks, waits):
+                DECISIONS.labels(self.name, rule.key, "rejected" if wait else "allowed").inc()
+            retry_after = max(waits)
+        if retry_after:
+            self.rejected += 1
+            logger.warning(f"Rate limit '{self.name}' exceeded by {client_ip(request)}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "rules": [{"key": r.key, "per_minute": r.per_minute, "burst": r.burst} for r in self.rules],
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+def stats() -> dict:
+    return {
+        "backend": settings.rate_limit_backend,
+        "local_buckets": len(_store),
+        "limiters": {name: limiter.stats() for name, limiter in REGISTRY.items()},
+    }
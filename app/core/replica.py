@@ -0,0 +1,80 @@
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it has replayed all received WAL.
+_LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+def is_disconnect(error: Exception) -> bool:
+    """Whether ``error`` means the connection itself failed, not the statement."""
+    return isinstance(error, OperationalError) or (
+        isinstance(error, DBAPIError) and error.connection_invalidated
+    )
+
+
+class ReplicaMonitor:
+    """Decides whether a read may be served by the replica.
+
+    The lag probe runs at most once per ``check_interval`` on the session about
+    to be used. A failed probe, or a read that loses its replica connection,
+    marks the replica down for ``retry_after`` seconds, during which reads fall
+    back to the primary without probing.
+    """
+
+    def __init__(self, dialect: str, max_lag: float, check_interval: float, retry_after: float):
+        self.lag_sql = text(_LAG_QUERIES.get(dialect, "SELECT 0"))
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+
+    async def usable(self, db) -> bool:
+        now = time.monotonic()
+        if now < self.down_until:
+            self.primary_fallbacks += 1
+            return False
+
+        if now - self.checked_at >= self.check_interval:
+            try:
+                self.lag = float(await db.scalar(self.lag_sql) or 0)
+            except (SQLAlchemyError, OSError) as e:
+                self.mark_down(e)
+                return False
+            self.checked_at = now
+            if self.lag > self.max_lag:
+                logger.warning(f"Replica lag {self.lag:.1f}s exceeds {self.max_lag}s, reading from primary")
+
+        if self.lag > self.max_lag:
+            self.primary_fallbacks += 1
+            return False
+
+        self.replica_reads += 1
+        return True
+
+    def mark_down(self, error: Exception):
+        logger.warning(f"Replica unavailable, falling back to primary for {self.retry_after}s: {error}")
+        self.down_until = time.monotonic() + self.retry_after
+        self.primary_fallbacks += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "down": time.monotonic() < self.down_until,
+            "replica_reads": self.replica_reads,
+            "primary_fallbacks": self.primary_fallbacks,
+        }
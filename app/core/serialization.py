@@ -0,0 +1,47 @@
+"""Trusted-output serialization.
+
+Rows we read from our own database already match the response schemas, so
+list endpoints can skip ORM instances and response-model re-validation: the
+handler selects plain columns and the rows are dumped straight to JSON by a
+cached ``TypeAdapter`` built from the response model's fields.
+"""
+from functools import lru_cache
+from typing import List, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+
+@lru_cache(maxsize=None)
+def _row_type(model: type) -> type:
+    fields = {name: _row_annotation(field.annotation) for name, field in model.model_fields.items()}
+    return TypedDict(f"{model.__name__}Row", fields)
+
+
+def _row_annotation(annotation):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _row_type(annotation)
+    if get_origin(annotation) is list:
+        return List[_row_annotation(get_args(annotation)[0])]
+    return annotation
+
+
+@lru_cache(maxsize=None)
+def row_adapter(model: type, many: bool = True) -> TypeAdapter:
+    row_type = _row_type(model)
+    return TypeAdapter(List[row_type] if many else row_type)
+
+
+def columns_for(model: type, orm_class) -> list:
+    """ORM columns matching the flat fields of ``model``, for ``select(*columns)``."""
+    return [getattr(orm_class, name) for name in model.model_fields]
+
+
+def trusted_response(model: type, data, many: bool = True, status_code: int = 200) -> Response:
+    """Serialize ``Row`` objects or dicts as ``model`` without validating them."""
+    if many:
+        data = [row if isinstance(row, dict) else row._asdict() for row in data]
+    elif not isinstance(data, dict):
+        data = data._asdict()
+    return Response(row_adapter(model, many).dump_json(data), status_code=status_code, media_type="application/json")
@@ -0,0 +1,155 @@
+"""Prometheus request metrics.
+
+Latency and response-size histograms are labelled by route template, so
+p50/p95/p99 come from ``histogram_quantile`` on the scrape side. Per-request
+query counts and DB time are collected from cursor events into a
+context-local accumulator. Set ``PROMETHEUS_MULTIPROC_DIR`` before starting
+uvicorn with several workers to aggregate across processes.
+"""
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+from app.monitoring import query_budget
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by route",
+    ["method", "route"], buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ["method", "route"], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class DbUsage:
+    __slots__ = ("queries", "seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def merge(self, other: "DbUsage"):
+        self.queries += other.queries
+        self.seconds += other.seconds
+        self.statements.update(other.statements)
+
+
+current_db_usage: ContextVar = ContextVar("current_db_usage", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context rather than the connection: a statement
+    # that raises never reaches the after hook, and must not leave a start
+    # time behind for the next statement on that pooled connection to pick up.
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    usage = current_db_usage.get()
+    if usage is not None:
+        started = getattr(context, "_metrics_query_start", None)
+        usage.queries += 1
+        if started is not None:
+            usage.seconds += time.perf_counter() - started
+        usage.statements[statement] += 1
+
+
+@contextmanager
+def untracked():
+    """Exclude the enclosed statements from the current request's usage (e.g. cache warm-up)."""
+    token = current_db_usage.set(None)
+    try:
+        yield
+    finally:
+        current_db_usage.reset(token)
+
+
+def instrument_engine(engine):
+    """Count statements and DB time of ``engine`` (sync or async) per request."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; avoids the extra task BaseHTTPMiddleware spawns."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        parent_usage = current_db_usage.get()
+        usage = DbUsage()
+        token = current_db_usage.set(usage)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_db_usage.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = route.path if route is not None else "<unmatched>"
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, path, str(status)).observe(elapsed)
+            RESPONSE_SIZE.labels(method, path).observe(size)
+            REQUEST_QUERIES.labels(method, path).observe(usage.queries)
+            REQUEST_DB_TIME.labels(method, path).observe(usage.seconds)
+            if parent_usage is not None:
+                parent_usage.merge(usage)
+
+        if route is not None and query_budget.enabled():
+            query_budget.enforce(getattr(route, "endpoint", None), f"{method} {path}", usage)
+
+
+def multiprocess_enabled() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def render() -> bytes:
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead():
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
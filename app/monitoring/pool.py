@@ -0,0 +1,157 @@
+"""Connection-pool instrumentation.
+
+Checked-out / overflow gauges and connection lifecycle counters are fed by
+SQLAlchemy pool events; checkout wait time is measured around the pool's
+``_do_get`` so requests queueing for a connection are visible too.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the checkout-wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+REGISTRY = {}
+
+
+class PoolStats:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.disconnects = 0
+        self.invalidations = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.max_overflow_used = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        idx = bisect_left(WAIT_BUCKETS, seconds)
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_buckets[idx] += 1
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+            if timed_out:
+                self.timeouts += 1
+
+    def _on_connect(self, dbapi_conn, conn_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_close(self, dbapi_conn, conn_record):
+        with self._lock:
+            self.disconnects += 1
+
+    def _on_invalidate(self, dbapi_conn, conn_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_checkout(self, dbapi_conn, conn_record, conn_proxy):
+        overflow = _call(self.engine.pool, "overflow")
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            if self.checked_out > self.max_checked_out:
+                self.max_checked_out = self.checked_out
+            if overflow is not None and overflow > self.max_overflow_used:
+                self.max_overflow_used = overflow
+
+    def _on_checkin(self, dbapi_conn, conn_record):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pool_class": type(pool).__name__,
+                "size": _call(pool, "size"),
+                "checked_in": _call(pool, "checkedin"),
+                "checked_out": self.checked_out,
+                "overflow": _call(pool, "overflow"),
+                "max_overflow": getattr(pool, "_max_overflow", None),
+                "max_checked_out": self.max_checked_out,
+                "max_overflow_used": self.max_overflow_used,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "disconnects": self.disconnects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait": {
+                    "count": self.wait_count,
+                    "total_seconds": self.wait_total,
+                    "max_seconds": self.wait_max,
+                    "avg_seconds": self.wait_total / self.wait_count if self.wait_count else 0.0,
+                    "buckets": {
+                        **{str(le): n for le, n in zip(WAIT_BUCKETS, self.wait_buckets)},
+                        "+Inf": self.wait_buckets[-1],
+                    },
+                },
+            }
+
+
+def _call(pool, method):
+    fn = getattr(pool, method, None)
+    return fn() if callable(fn) else None
+
+
+class _TimedCheckoutMixin:
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start, timed_out)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same stats.
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine, name: str) -> PoolStats:
+    """Attach pool listeners to ``engine`` (sync or async) and register its stats."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    stats = PoolStats(name, sync_engine)
+    if isinstance(sync_engine.pool, _TimedCheckoutMixin):
+        sync_engine.pool.stats = stats
+    event.listen(sync_engine, "connect", stats._on_connect)
+    event.listen(sync_engine, "close", stats._on_close)
+    event.listen(sync_engine, "invalidate", stats._on_invalidate)
+    event.listen(sync_engine, "checkout", stats._on_checkout)
+    event.listen(sync_engine, "checkin", stats._on_checkin)
+    REGISTRY[name] = stats
+    return stats
+
+
+def snapshot() -> dict:
+    return {name: stats.snapshot() for name, stats in REGISTRY.items()}
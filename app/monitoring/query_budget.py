@@ -0,0 +1,81 @@
+"""Per-endpoint SQL budgets and N+1 detection.
+
+Routes declare how many statements a request may run with ``@query_budget(n)``.
+With ``settings.query_budget_mode`` set to ``"warn"`` or ``"raise"`` the
+metrics middleware checks every request against its route's budget and flags
+statements repeated ``query_budget_repeat_threshold`` times or more (the same
+SQL with different parameters, i.e. an N+1 loop). ``assert_queries`` applies
+the same checks to an arbitrary block, e.g. inside a test.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries: Optional[int]):
+    """Declare the statement budget of a route handler.
+
+    ``None`` marks a bulk endpoint whose statement count grows with its input
+    by design; neither the budget nor the N+1 check applies to it.
+    """
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def enabled() -> bool:
+    return settings.query_budget_mode in ("warn", "raise")
+
+
+def find_problems(usage, budget: Optional[int], repeat_threshold: int) -> list:
+    problems = []
+    if budget is not None and usage.queries > budget:
+        problems.append(f"ran {usage.queries} queries, budget is {budget}")
+    for statement, count in usage.statements.items():
+        if count >= repeat_threshold:
+            problems.append(f"possible N+1: executed {count}x: {' '.join(statement.split())[:200]}")
+    return problems
+
+
+def enforce(endpoint, label: str, usage):
+    if hasattr(endpoint, "query_budget") and endpoint.query_budget is None:
+        return
+    budget = getattr(endpoint, "query_budget", None)
+    problems = find_problems(usage, budget, settings.query_budget_repeat_threshold)
+    if not problems:
+        return
+    message = f"{label}: " + "; ".join(problems)
+    if settings.query_budget_mode == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def assert_queries(max_queries: Optional[int] = None, repeat_threshold: Optional[int] = None):
+    """Fail if the enclosed block exceeds ``max_queries`` or repeats a statement.
+
+    Requests awaited in-process through ``httpx.ASGITransport`` inside the
+    block are counted as well.
+    """
+    from app.monitoring.metrics import DbUsage, current_db_usage
+
+    usage = DbUsage()
+    token = current_db_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        current_db_usage.reset(token)
+
+    threshold = repeat_threshold or settings.query_budget_repeat_threshold
+    problems = find_problems(usage, max_queries, threshold)
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems))
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Response
+
+from app.auth.hashing import hasher
+from app.auth.revocation import revoked
+from app.core import cache, database, ratelimit
+from app.core.deps import require_admin
+from app.monitoring import metrics, pool as pool_monitor
+from app.monitoring.query_budget import query_budget
+from app.products import autocomplete, catalog_cache, search
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+metrics_router = APIRouter(tags=["internal"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+@query_budget(0)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/db-pool")
+@query_budget(0)
+async def db_pool_stats(admin=Depends(require_admin)):
+    return pool_monitor.snapshot()
+
+
+@router.get("/replica")
+@query_budget(0)
+async def replica_status(admin=Depends(require_admin)):
+    if database.replica_monitor is None:
+        return {"configured": False}
+    return {"configured": True, **database.replica_monitor.snapshot()}
+
+
+@router.get("/caches")
+@query_budget(0)
+async def cache_stats(admin=Depends(require_admin)):
+    return {
+        **{name: c.stats() for name, c in cache.REGISTRY.items()},
+        "product_search_index": search.index.stats(),
+        "catalog_single_flight": catalog_cache.stats(),
+        "autocomplete_index": autocomplete.index.stats(),
+    }
+
+
+@router.get("/password-hasher")
+@query_budget(0)
+async def password_hasher_stats(admin=Depends(require_admin)):
+    return hasher.stats()
+
+
+@router.get("/revocations")
+@query_budget(0)
+async def revocation_stats(admin=Depends(require_admin)):
+    return revoked.stats()
+
+
+@router.get("/rate-limits")
+@query_budget(0)
+async def rate_limit_stats(admin=Depends(require_admin)):
+    return ratelimit.stats()
@@ -1,24 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 import logging
 
-from app.core.deps import get_db, require_user
+from app.core.config import settings
+from app.core.deps import get_read_db, require_user
+from app.core.serialization import columns_for, trusted_response
 from app.orders import models as order_models, schemas as order_schemas
+from app.monitoring.query_budget import query_budget
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+ORDER_SUMMARY_COLUMNS = columns_for(order_schemas.OrderSummary, order_models.Order)
+
 logger = logging.getLogger(__name__)
 
 
 @router.get("", response_model=list[order_schemas.OrderSummary])
-def get_order_history(db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(2)
+async def get_order_history(db: AsyncSession = Depends(get_read_db), current_user=Depends(require_user)):
     try:
-        orders = (
-            db.query(order_models.Order)
+        query = (
+            select(order_models.Order)
             .filter_by(user_id=current_user.id)
             .order_by(order_models.Order.created_at.desc())
-            .all()
         )
+        if settings.trusted_output:
+            rows = (await db.execute(query.with_only_columns(*ORDER_SUMMARY_COLUMNS))).all()
+            logger.info("Fetched %d orders for user_id=%s", len(rows), current_user.id)
+            return trusted_response(order_schemas.OrderSummary, rows)
+
+        orders = (await db.scalars(query)).all()
 
         logger.info("Fetched %d orders for user_id=%s", len(orders), current_user.id)
         return orders
@@ -35,12 +48,14 @@ def get_order_history(db: Session = Depends(get_db), current_user=Depends(requir
 
 
 @router.get("/{order_id}", response_model=order_schemas.OrderOut)
-def get_order_detail(order_id: int, db: Session = Depends(get_db), current_user=Depends(require_user)):
+@query_budget(3)
+async def get_order_detail(order_id: int, db: AsyncSession = Depends(get_read_db), current_user=Depends(require_user)):
     try:
-        order = (
-            db.query(order_models.Order)
+        # Items are serialized after the handler returns, so load them eagerly.
+        order = await db.scalar(
+            select(order_models.Order)
+            .options(selectinload(order_models.Order.items))
             .filter_by(id=order_id, user_id=current_user.id)
-            .first()
         )
 
         if not order:
@@ -1,20 +1,21 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List
 from datetime import datetime
 
 
 class OrderItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     product_id: int
     quantity: int
     price_at_purchase: float
 
-    class Config:
-        from_attributes = True
-
 
 class OrderOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user_id: int
     total_amount: float
@@ -22,15 +23,12 @@ class OrderOut(BaseModel):
     created_at: datetime
     items: List[OrderItemOut]
 
-    class Config:
-        from_attributes = True
-        
+
 class OrderSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user_id: int
     total_amount: float
     status: str
     created_at: datetime
-
-    class Config:
-        from_attributes = True
\ No newline at end of file
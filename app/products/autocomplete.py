@@ -0,0 +1,511 @@
+"""In-process prefix index for ``/products/autocomplete``.
+
+Each worker keeps the sorted vocabulary of words in product names and, per
+word, an ``array('I')`` of the ids of products whose name contains it, ordered
+by rank: units sold (from ``order_items``, then topped up by checkout), ties to
+the lower id. A query's last word is treated as a prefix and ``bisect`` finds
+the run of vocabulary words that start with it. Prefixes whose run holds many
+postings keep their best-ranked ids precomputed, so a one-word query reads a
+list instead of ranking every match; for the rest only the head of each
+posting is ranked. With earlier words, the bitmaps kept for common words are
+ANDed when few products have them all; otherwise the shortest of their
+postings is walked in rank order until ``limit`` products also have the other
+words. The endpoint never touches the database. Categories that start with the query are
+suggested alongside, largest first.
+
+The index is built in the background at startup and rebuilt every
+``autocomplete_rebuild_interval_seconds``; the admin product routes, batch
+update, bulk import and checkout update it in place (postings and precomputed
+rankings alike) as they commit. A rebuild reads the table, builds the new index
+in a worker thread and swaps it in with one assignment; writes and sales
+recorded meanwhile are replayed onto it first. Writes made by other workers
+show up at the next rebuild. Results for a query are cached until a write to a
+product or category with a word it prefixes, or for
+``autocomplete_cache_ttl_seconds``.
+"""
+import asyncio
+import heapq
+import logging
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import accumulate
+from os.path import commonprefix
+
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core import database
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.monitoring import metrics
+from app.orders.models import OrderItem
+from app.products.models import Product
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Prefixes whose vocabulary run holds at least this many postings keep a
+# precomputed ranking; smaller runs are cheap enough to rank per query.
+_PRECOMPUTE_MIN_POSTINGS = 2000
+# Length of a precomputed ranking, leaving room for deletions before a refill.
+_RANKED = 2 * settings.autocomplete_max_limit
+# Words in at least 1/64 of the products (and that many postings) also keep an
+# int bitmap of their ids, so queries combining them are ANDed in C; at most
+# this many matches are read back out instead of walking a posting.
+_BITMAP_SHARE = 64
+_BITMAP_MAX_MATCHES = 1024
+
+_NONZERO = re.compile(rb"[^\x00]")
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def words(text) -> list:
+    """Distinct lowercase word tokens of ``text``, in order."""
+    return list(dict.fromkeys(_WORD.findall((text or "").lower())))
+
+
+def _spaced(text) -> str:
+    """The words of ``text`` between single spaces, for cheap substring checks."""
+    return " " + " ".join(words(text)) + " "
+
+
+def _bitmap_ids(bits: int):
+    """Positions of the set bits of ``bits``, ascending."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for match in _NONZERO.finditer(data):
+        base = match.start() * 8
+        for bit in _BITS[data[match.start()]]:
+            yield base + bit
+
+
+def prefixes(text) -> set:
+    """Every prefix of every word of ``text``."""
+    return {word[:n] for word in words(text) for n in range(1, len(word) + 1)}
+
+
+class _Index:
+    """One generation of the index; mutated only on the event loop once published."""
+
+    def __init__(self, vocabulary: list, postings: list, products: dict, categories: dict, popularity: dict):
+        # sorted distinct words, and the product ids of each in rank order
+        self.vocabulary = vocabulary
+        self.postings = postings
+        # product_id -> (name, category, _spaced(name))
+        self.products = products
+        # category -> number of products
+        self.categories = categories
+        # product_id -> units sold
+        self.popularity = popularity
+        # prefix -> best-ranked ids of products with a word starting with it,
+        # the first len() of them exactly; only for prefixes with long runs
+        self.ranked = {}
+        # word -> int with bit ``id`` set per product; only for common words
+        self.bitmaps = {}
+
+    def rank(self, product_id: int) -> tuple:
+        return -self.popularity.get(product_id, 0), product_id
+
+    @classmethod
+    def build(cls, rows, sales) -> "_Index":
+        """From ``(id, name, category)`` rows; CPU-bound, run off the event loop."""
+        index = cls([], [], {}, {}, {product_id: int(units) for product_id, units in sales})
+        ids_by_word = defaultdict(list)
+        categories = defaultdict(int)
+        # Rows in rank order, so every posting comes out ranked.
+        for product_id, name, category in sorted(rows, key=lambda row: index.rank(row[0])):
+            for word in words(name):
+                ids_by_word[word].append(product_id)
+            index.products[product_id] = (name, category, _spaced(name))
+            if category:
+                categories[category] += 1
+        index.vocabulary = sorted(ids_by_word)
+        index.postings = [array("I", ids_by_word.pop(word)) for word in index.vocabulary]
+        index.categories = dict(categories)
+        index._precompute()
+        index._build_bitmaps()
+        return index
+
+    def _build_bitmaps(self):
+        # Ids far sparser than the products would make every bitmap mostly zeros.
+        if not self.products or max(self.products) > 4 * len(self.products):
+            return
+        for word, ids in zip(self.vocabulary, self.postings):
+            if len(ids) >= _PRECOMPUTE_MIN_POSTINGS and len(ids) * _BITMAP_SHARE >= len(self.products):
+                bits = bytearray(max(ids) // 8 + 1)
+                for product_id in ids:
+                    bits[product_id >> 3] |= 1 << (product_id & 7)
+                self.bitmaps[word] = int.from_bytes(bits, "little")
+
+    def _precompute(self):
+        sizes = list(accumulate((len(ids) for ids in self.postings), initial=0))
+        heavy = []
+        previous = ""
+        for i, word in enumerate(self.vocabulary):
+            # Prefixes shared with the previous word were looked at there; a
+            # prefix's run only shrinks as it grows, so stop at the first short one.
+            for length in range(len(commonprefix((previous, word))) + 1, len(word) + 1):
+                prefix = word[:length]
+                end = bisect_left(self.vocabulary, prefix + "{", i)
+                if sizes[end] - sizes[i] < _PRECOMPUTE_MIN_POSTINGS:
+                    break
+                heavy.append(prefix)
+            previous = word
+        # Longest first, so each ranking starts from its extensions' rankings.
+        for prefix in sorted(heavy, key=len, reverse=True):
+            self.ranked[prefix] = self._rank_run(prefix)
+
+    def _rank_run(self, prefix: str) -> list:
+        """Best-ranked ids among products with a word starting with ``prefix``."""
+        # Words are [a-z0-9], so "{" sorts after every word starting with prefix.
+        i = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "{", i)
+        candidates = set()
+        size = _RANKED
+        while i < end:
+            extension = self.vocabulary[i][:len(prefix) + 1]
+            ranked = self.ranked.get(extension) if len(extension) > len(prefix) else None
+            if ranked is None:
+                candidates.update(self.postings[i][:_RANKED])
+                i += 1
+            else:
+                candidates.update(ranked)
+                size = min(size, len(ranked))
+                i = bisect_left(self.vocabulary, extension + "{", i, end)
+        return heapq.nsmallest(size, candidates, key=self.rank)
+
+    def _ranked_prefixes(self, name) -> list:
+        """Prefixes of ``name``'s words that keep a ranking, longest first."""
+        return sorted(self.ranked.keys() & prefixes(name), key=len, reverse=True)
+
+    def _count_category(self, category, delta: int):
+        if category:
+            remaining = self.categories.get(category, 0) + delta
+            if remaining:
+                self.categories[category] = remaining
+            else:
+                del self.categories[category]
+
+    def add(self, product_id: int, name, category):
+        for word in words(name):
+            i = bisect_left(self.vocabulary, word)
+            if i == len(self.vocabulary) or self.vocabulary[i] != word:
+                self.vocabulary.insert(i, word)
+                self.postings.insert(i, array("I"))
+            insort(self.postings[i], product_id, key=self.rank)
+            if word in self.bitmaps:
+                self.bitmaps[word] |= 1 << product_id
+        self.products[product_id] = (name, category, _spaced(name))
+        self._count_category(category, 1)
+        rank = self.rank(product_id)
+        for prefix in self._ranked_prefixes(name):
+            ranked = self.ranked[prefix]
+            if not ranked or rank < self.rank(ranked[-1]):
+                insort(ranked, product_id, key=self.rank)
+                del ranked[_RANKED:]
+
+    def remove(self, product_id: int):
+        entry = self.products.pop(product_id, None)
+        if entry is None:
+            return
+        name, category, spaced = entry
+        rank = self.rank(product_id)
+        for word in spaced.split():
+            i = bisect_left(self.vocabulary, word)
+            ids = self.postings[i]
+            del ids[bisect_left(ids, rank, key=self.rank)]
+            if word in self.bitmaps:
+                self.bitmaps[word] &= ~(1 << product_id)
+            if not ids:
+                del self.vocabulary[i]
+                del self.postings[i]
+        self._count_category(category, -1)
+        for prefix in self._ranked_prefixes(name):
+            ranked = self.ranked[prefix]
+            if product_id in ranked:
+                ranked.remove(product_id)
+                if len(ranked) < settings.autocomplete_max_limit:
+                    self.ranked[prefix] = self._rank_run(prefix)
+
+    def upsert(self, product_id: int, name, category):
+        entry = self.products.get(product_id)
+        if entry is not None and entry[2] == _spaced(name):
+            # Same words: postings and rankings stay as they are.
+            self._count_category(entry[1], -1)
+            self._count_category(category, 1)
+            self.products[product_id] = (name, category, entry[2])
+            return
+        self.remove(product_id)
+        self.add(product_id, name, category)
+
+    def sale(self, product_id: int, quantity: int):
+        entry = self.products.get(product_id)
+        if entry is None:
+            self.popularity[product_id] = self.popularity.get(product_id, 0) + quantity
+            return
+        ranked_prefixes = self._ranked_prefixes(entry[0])
+        rank = self.rank(product_id)
+        postings = []
+        for word in entry[2].split():
+            ids = self.postings[bisect_left(self.vocabulary, word)]
+            del ids[bisect_left(ids, rank, key=self.rank)]
+            postings.append(ids)
+        held = []
+        for prefix in ranked_prefixes:
+            ranked = self.ranked[prefix]
+            if product_id in ranked:
+                ranked.remove(product_id)
+                held.append(ranked)
+        self.popularity[product_id] = self.popularity.get(product_id, 0) + quantity
+        rank = self.rank(product_id)
+        for ids in postings:
+            insort(ids, product_id, key=self.rank)
+        # Its rank only improved, so it keeps a place in the rankings it was in.
+        for ranked in held:
+            insort(ranked, product_id, key=self.rank)
+        for prefix in ranked_prefixes:
+            ranked = self.ranked[prefix]
+            if product_id not in ranked and (not ranked or rank < self.rank(ranked[-1])):
+                insort(ranked, product_id, key=self.rank)
+                del ranked[_RANKED:]
+
+    def exact(self, word: str):
+        i = bisect_left(self.vocabulary, word)
+        if i < len(self.vocabulary) and self.vocabulary[i] == word:
+            return self.postings[i]
+        return ()
+
+    def prefixed(self, prefix: str) -> list:
+        return self.postings[bisect_left(self.vocabulary, prefix):bisect_left(self.vocabulary, prefix + "{")]
+
+    def matching(self, whole: list, prefix: str, limit: int) -> list:
+        """The ``limit`` best-ranked ids with every word in ``whole`` and one starting with ``prefix``."""
+        if not whole:
+            ranked = self.ranked.get(prefix)
+            if ranked is None or len(ranked) < limit:
+                ranked = self._rank_run(prefix)
+            return ranked[:limit]
+
+        exact = sorted(((self.exact(word), word) for word in set(whole)), key=lambda pair: len(pair[0]))
+        walk = exact[0][0]
+        if not walk:
+            return []
+        # Building sets from long postings costs more than walking the
+        # shortest one in rank order until enough products have every word,
+        # checked against their spaced words, rarest word first.
+        needles = [f" {word} " for _, word in exact] + [f" {prefix}"]
+        products = self.products
+
+        def matches(product_id):
+            spaced = products[product_id][2]
+            for needle in needles:
+                if needle not in spaced:
+                    return False
+            return True
+
+        if prefix not in self.ranked:
+            starting = set().union(*self.prefixed(prefix))
+            if len(starting) < len(walk):
+                return heapq.nsmallest(limit, filter(matches, starting), key=self.rank)
+        if all(word in self.bitmaps for _, word in exact):
+            bits = self.bitmaps[exact[0][1]]
+            for _, word in exact[1:]:
+                bits &= self.bitmaps[word]
+            # Few products have every word: rank those rather than walk to
+            # the end of the posting looking for them.
+            if bits.bit_count() <= _BITMAP_MAX_MATCHES:
+                return heapq.nsmallest(limit, filter(matches, _bitmap_ids(bits)), key=self.rank)
+        found = []
+        rest = needles[1:]
+        for product_id in walk:
+            spaced = products[product_id][2]
+            for needle in rest:
+                if needle not in spaced:
+                    break
+            else:
+                found.append(product_id)
+                if len(found) == limit:
+                    break
+        return found
+
+
+_EMPTY = _Index([], [], {}, {}, {})
+
+
+class PrefixIndex:
+    def __init__(self, rebuild_interval: float):
+        self.rebuild_interval = rebuild_interval
+        self._index = _EMPTY
+        self._results = TTLCache(
+            "autocomplete_results", settings.autocomplete_cache_size, ttl=settings.autocomplete_cache_ttl_seconds
+        )
+        # last query word -> cached result keys, so a write only drops the
+        # results its words could change
+        self._cached = defaultdict(set)
+        self._tracked = 0
+        # Writes and sales made while a rebuild runs, replayed onto its result
+        self._journal = None
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.ready = False
+
+    def _apply(self, index: _Index, entry: tuple):
+        kind, product_id, *args = entry
+        if kind == "sale":
+            index.sale(product_id, *args)
+        elif kind == "upsert":
+            index.upsert(product_id, *args)
+        else:
+            index.remove(product_id)
+
+    def _record(self, entry: tuple):
+        if self._journal is not None:
+            self._journal.append(entry)
+        if self.ready:
+            self._apply(self._index, entry)
+
+    def _invalidate(self, product_id: int, *texts):
+        """Drop cached results whose last word prefixes a word of the product's old or new name or category."""
+        texts += self._index.products.get(product_id, ())[:2]
+        for prefix in prefixes(" ".join(text for text in texts if text)):
+            keys = self._cached.pop(prefix, ())
+            self._tracked -= len(keys)
+            for key in keys:
+                self._results.delete(key)
+
+    def _clear_results(self):
+        self._results.clear()
+        self._cached.clear()
+        self._tracked = 0
+
+    def upsert(self, product):
+        """Index or re-index anything with ``id``, ``name`` and ``category``."""
+        self._invalidate(product.id, product.name, product.category)
+        self._record(("upsert", product.id, product.name, product.category))
+
+    def remove(self, product_id: int):
+        self._invalidate(product_id)
+        self._record(("remove", product_id))
+
+    def record_sale(self, product_id: int, quantity: int):
+        self._record(("sale", product_id, quantity))
+
+    def complete(self, query: str, limit: int) -> dict:
+        query_words = _WORD.findall(query.lower())
+        key = (tuple(query_words), limit)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        index = self._index
+        products = []
+        if query_words:
+            *whole, prefix = query_words
+            best = index.matching(whole, prefix, limit)
+            products = [
+                {"id": pid, "name": index.products[pid][0], "category": index.products[pid][1]}
+                for pid in best
+            ]
+
+        text = " ".join(query_words)
+        categories = [
+            category for category, _ in heapq.nlargest(
+                limit,
+                ((c, n) for c, n in index.categories.items() if " ".join(_WORD.findall(c.lower())).startswith(text)),
+                key=lambda item: (item[1], item[0]),
+            )
+        ] if text else []
+
+        result = {"products": products, "categories": categories}
+        if query_words:
+            # Keys the LRU has since evicted stay tracked; bound them by
+            # starting over once they outnumber the cache twice.
+            if self._tracked >= 2 * self._results.maxsize:
+                self._clear_results()
+            keys = self._cached[query_words[-1]]
+            if key not in keys:
+                keys.add(key)
+                self._tracked += 1
+        self._results.set(key, result)
+        return result
+
+    async def _load(self):
+        # A background (re)build, not the cost of whichever request waits on it.
+        self._journal = []
+        try:
+            with metrics.untracked():
+                db = await database.open_read_session()
+                try:
+                    rows = (await db.execute(
+                        select(Product.id, Product.name, Product.category).order_by(Product.id)
+                    )).all()
+                    sales = (await db.execute(
+                        select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id)
+                    )).all()
+                finally:
+                    await db.close()
+            fresh = await run_in_threadpool(_Index.build, rows, sales)
+            # The snapshot may predate writes and sales recorded since the
+            # journal opened; a sale that committed just before the read can
+            # count twice, which only nudges its ranking.
+            for entry in self._journal:
+                self._apply(fresh, entry)
+        finally:
+            self._journal = None
+        self._publish(fresh)
+
+    def load(self, rows, sales):
+        """Build from ``(id, name, category)`` rows and ``(product_id, units)`` sales in this thread and publish it."""
+        self._publish(_Index.build(rows, sales))
+
+    def _publish(self, fresh: _Index):
+        self._index = fresh
+        self._clear_results()
+        self.ready = True
+        logger.info(f"Autocomplete index built: {len(fresh.products)} products, {len(fresh.vocabulary)} words")
+
+    async def ensure_built(self):
+        if self.ready:
+            return
+        async with self._lock:
+            if not self.ready:
+                await self._load()
+
+    async def _run(self):
+        while True:
+            try:
+                async with self._lock:
+                    await self._load()
+            except Exception as e:
+                logger.error(f"Failed to build autocomplete index: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "ready": self.ready,
+            "products": len(index.products),
+            "words": len(index.vocabulary),
+            "postings": sum(len(ids) for ids in index.postings),
+            "ranked_prefixes": len(index.ranked),
+            "bitmaps": len(index.bitmaps),
+            "categories": len(index.categories),
+        }
+
+
+index = PrefixIndex(settings.autocomplete_rebuild_interval_seconds)
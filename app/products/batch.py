@@ -0,0 +1,97 @@
+"""Set-based batch updates of products.
+
+The affected rows are read and locked with one ``SELECT ... FOR UPDATE``,
+which also tells which ids exist and gives the old values the facet counts
+move from. Items are then grouped by the set of fields they change, and each
+group becomes a single statement: on PostgreSQL ``UPDATE products ... FROM
+(VALUES ...)`` joined on id, elsewhere (SQLite) an executemany of one
+parameterized ``UPDATE``. Both run on the Core table, so ORM objects already
+loaded in the caller's session are not refreshed; everything runs in its
+transaction.
+"""
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import Integer, bindparam, column, select, update, values
+
+from app.core import database
+from app.products import facets, models
+
+FIELDS = ("name", "description", "price", "stock", "category", "image_url")
+
+
+def _groups(items) -> dict:
+    """``{changed field names: {id: changes}}``; entries for a repeated id merge, later fields winning."""
+    merged = defaultdict(dict)
+    for item in items:
+        merged[item.id].update(item.model_dump(include=set(FIELDS), exclude_unset=True))
+    groups = defaultdict(dict)
+    for product_id, changes in merged.items():
+        if changes:
+            groups[tuple(name for name in FIELDS if name in changes)][product_id] = changes
+    return groups
+
+
+async def _update_from_values(db, fields, changes: dict, now: datetime):
+    table = models.Product.__table__
+    rows = values(
+        column("id", Integer), *[column(name, table.c[name].type) for name in fields], name="v"
+    ).data([(product_id, *[change[name] for name in fields]) for product_id, change in changes.items()])
+    stmt = (
+        update(table)
+        .where(table.c.id == rows.c.id)
+        .values({**{name: rows.c[name] for name in fields}, "updated_at": now})
+    )
+    await db.execute(stmt)
+
+
+async def _update_many(db, fields, changes: dict, now: datetime):
+    # Core table, not the mapped class: an ORM update given a parameter list
+    # would switch to bulk-update-by-primary-key mode.
+    table = models.Product.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values({**{name: bindparam(f"b_{name}") for name in fields}, "updated_at": now})
+    )
+    await db.execute(stmt, [
+        {"b_id": product_id, **{f"b_{name}": change[name] for name in fields}}
+        for product_id, change in changes.items()
+    ])
+
+
+async def apply(db, items) -> tuple:
+    """Apply ``ProductBatchItem``s; returns ``(updated rows, missing ids)``.
+
+    Updated rows carry every product field as it is after the update.
+    """
+    groups = _groups(items)
+    requested = {product_id for changes in groups.values() for product_id in changes}
+    if not requested:
+        return [], []
+    table = models.Product.__table__
+    current = {row.id: row._asdict() for row in (await db.execute(
+        select(table.c.id, *[table.c[name] for name in FIELDS])
+        .where(table.c.id.in_(requested))
+        .order_by(table.c.id)
+        .with_for_update()
+    )).all()}
+
+    now = datetime.utcnow()
+    update_group = _update_from_values if database.engine.dialect.name == "postgresql" else _update_many
+    facet_changes = facets.FacetChanges()
+    for fields, changes in groups.items():
+        changes = {product_id: change for product_id, change in changes.items() if product_id in current}
+        if not changes:
+            continue
+        await update_group(db, fields, changes, now)
+        for product_id, change in changes.items():
+            row = current[product_id]
+            facet_changes.remove(row["category"], row["price"], row["stock"])
+            row.update(change)
+            facet_changes.add(row["category"], row["price"], row["stock"])
+    await facet_changes.apply(db)
+
+    updated = [SimpleNamespace(**row) for row in current.values()]
+    return updated, sorted(requested - current.keys())
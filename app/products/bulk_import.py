@@ -0,0 +1,243 @@
+"""Streaming bulk product import.
+
+Accepts CSV (with a header row) or NDJSON, parsed incrementally from the
+request body or a file so memory use does not grow with the upload. Each row
+is validated against ``ProductImport``; valid rows are collected into batches
+of ``product_import_batch_size`` and upserted by ``sku`` with one multi-row
+``INSERT ... ON CONFLICT (sku) DO UPDATE`` per batch, committed batch by
+batch. An imported row replaces every field of the product with that SKU.
+Invalid rows are skipped and reported by line number.
+
+    python -m app.products.bulk_import feed.csv.gz
+    curl -X POST --data-binary @feed.ndjson -H "Content-Type: application/x-ndjson" \\
+        -H "Authorization: Bearer $TOKEN" http://localhost:8000/admin/products/import
+
+Imports through the API update this worker's search and autocomplete indexes
+and catalog cache; other workers and CLI imports are picked up as those
+caches expire or are rebuilt.
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import gzip
+import json
+import logging
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from app.core import database
+from app.core.config import settings
+from app.products import autocomplete, catalog_cache, facets, models, schemas, search
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+CHUNK_SIZE = 64 * 1024
+
+UPDATE_COLUMNS = [name for name in schemas.ProductImport.model_fields if name != "sku"] + ["updated_at"]
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    upserted: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < settings.product_import_max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds, 1) if self.seconds else None,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def gunzip(chunks):
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
+async def _lines(chunks):
+    """``(line number, text)`` for each line of a UTF-8 byte stream."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    number = 0
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            number += 1
+            yield number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield number + 1, pending.rstrip("\r")
+
+
+# Both parsers yield ``(line number, row dict)``, or ``(line number, message)``
+# for a record that could not be parsed at all.
+
+async def parse_csv(chunks):
+    header = None
+    record, start = None, 0
+    async for number, line in _lines(chunks):
+        if record is None:
+            record, start = line, number
+        else:
+            record += "\n" + line
+        # An odd number of quotes means a quoted field continues on the next line.
+        if record.count('"') % 2:
+            continue
+        text, record = record, None
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, f"expected {len(header)} fields, got {len(values)}"
+            continue
+        # Empty cells are missing values, not empty strings.
+        yield start, {name: value if value != "" else None for name, value in zip(header, values)}
+    if record is not None:
+        yield start, "unterminated quoted field"
+
+
+async def parse_ndjson(chunks):
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"invalid JSON: {e}"
+            continue
+        yield number, row if isinstance(row, dict) else "expected a JSON object"
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+def upsert_statement(rows: list):
+    stmt = database.upsert_insert(models.Product).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Product.sku],
+        set_={name: stmt.excluded[name] for name in UPDATE_COLUMNS},
+    )
+    return stmt.returning(models.Product.id, models.Product.name, models.Product.description, models.Product.category)
+
+
+async def _write_batch(db, batch: dict, report: ImportReport):
+    # Facet counts move off the existing rows' old values; lock them first.
+    changes = facets.FacetChanges()
+    for row in (await db.execute(
+        select(models.Product.category, models.Product.price, models.Product.stock)
+        .where(models.Product.sku.in_(batch.keys()))
+        .order_by(models.Product.id)
+        .with_for_update()
+    )).all():
+        changes.remove(row.category, row.price, row.stock)
+    for row in batch.values():
+        changes.add(row["category"], row["price"], row["stock"])
+
+    written = (await db.execute(upsert_statement(list(batch.values())))).all()
+    await changes.apply(db)
+    await db.commit()
+    for row in written:
+        search.index.upsert(row)
+        autocomplete.index.upsert(row)
+    catalog_cache.invalidate(*(row.id for row in written))
+    report.upserted += len(written)
+
+
+async def import_products(db, records, batch_size: int = None) -> ImportReport:
+    """Validate and upsert the ``(line, row)`` pairs of ``parse_csv`` / ``parse_ndjson``."""
+    batch_size = batch_size or settings.product_import_batch_size
+    report = ImportReport()
+    started = time.perf_counter()
+    # sku -> row; a SKU repeated within one batch keeps its last row, since
+    # ON CONFLICT cannot update the same row twice in one statement.
+    batch = {}
+    async for line, data in records:
+        report.rows += 1
+        if isinstance(data, str):
+            report.error(line, data)
+            continue
+        try:
+            product = schemas.ProductImport.model_validate(data)
+        except ValidationError as e:
+            report.error(line, _describe(e))
+            continue
+        # ON CONFLICT DO UPDATE skips column onupdate hooks, so stamp it here.
+        batch[product.sku] = {**product.model_dump(), "updated_at": datetime.utcnow()}
+        if len(batch) >= batch_size:
+            await _write_batch(db, batch, report)
+            batch = {}
+    if batch:
+        await _write_batch(db, batch, report)
+    report.seconds = time.perf_counter() - started
+    logger.info(
+        f"Product import: {report.rows} rows, {report.upserted} upserted, {report.failed} failed "
+        f"in {report.seconds:.1f}s"
+    )
+    return report
+
+
+async def _file_chunks(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _guess_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+async def _main(args):
+    db = database.new_session()
+    try:
+        report = await import_products(
+            db, PARSERS[args.format or _guess_format(args.path)](_file_chunks(args.path)), args.batch_size
+        )
+    finally:
+        await db.close()
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    # Register every model so the Product mapper's relationships resolve.
+    import app.auth.models, app.cart.models, app.orders.models  # noqa: E401,F401
+
+    parser = argparse.ArgumentParser(description="Upsert products by SKU from a CSV or NDJSON file (optionally .gz).")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=None)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
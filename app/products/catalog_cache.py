@@ -0,0 +1,144 @@
+"""Read-through cache and conditional GETs for the public catalog.
+
+Product detail and listing responses are cached as rendered JSON bytes, keyed
+by product id or by the normalized listing query (filters, sort, page or
+cursor, page size), in LRU caches whose entries also expire after
+``catalog_cache_ttl_seconds``. Concurrent misses on the same key are
+coalesced: the first request loads, the rest wait for its result, so a hot
+product that falls out of the cache costs one query rather than one per
+request.
+
+The admin product routes call ``invalidate`` after they commit. That drops the
+products' detail entries and every cached listing, and discards loads that were
+already in flight so they cannot store pre-write data. Other workers keep
+serving their copies until the TTL runs out. Stock moved by checkout does not
+invalidate either, so the ``stock`` shown may lag by up to the TTL; checkout
+itself always checks stock against the database.
+
+Every catalog response carries a strong ``ETag`` (a hash of the body); a
+request whose ``If-None-Match`` matches gets an empty 304.
+"""
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.serialization import row_adapter
+
+CACHE_CONTROL = "public, no-cache"
+
+_details = TTLCache("catalog_products", settings.catalog_cache_size, ttl=settings.catalog_cache_ttl_seconds)
+_listings = TTLCache("catalog_listings", settings.catalog_cache_size, ttl=settings.catalog_cache_ttl_seconds)
+
+# (cache name, key) -> Future of the load in progress
+_inflight = {}
+_generation = 0
+_coalesced = 0
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: dict = field(default_factory=dict)
+
+
+@lru_cache(maxsize=None)
+def _model_adapter(model: type, many: bool) -> TypeAdapter:
+    return TypeAdapter(List[model] if many else model)
+
+
+def render(model: type, rows, many: bool = True, headers=None) -> CachedResponse:
+    """Serialize ``Row`` objects as ``model``; validated unless ``trusted_output`` is on."""
+    if settings.trusted_output:
+        data = [row._asdict() for row in rows] if many else rows._asdict()
+        body = row_adapter(model, many).dump_json(data)
+    else:
+        adapter = _model_adapter(model, many)
+        body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedResponse(body, etag, headers or {})
+
+
+def _etag_matches(header, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x".
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def respond(request: Request, cached: CachedResponse) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL, **cached.headers}
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+async def _load(cache: TTLCache, key, loader) -> CachedResponse:
+    global _coalesced
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    flight_key = (cache.name, key)
+    pending = _inflight.get(flight_key)
+    if pending is not None:
+        _coalesced += 1
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # The loading request was cancelled; load for ourselves.
+
+    generation = _generation
+    future = asyncio.get_running_loop().create_future()
+    # Waiters re-raise a failed load (e.g. a 404) themselves; don't warn when there were none.
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[flight_key] = future
+    try:
+        cached = await loader()
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        if _inflight.get(flight_key) is future:
+            del _inflight[flight_key]
+    if generation == _generation:
+        cache.set(key, cached)
+    future.set_result(cached)
+    return cached
+
+
+async def product(product_id: int, loader) -> CachedResponse:
+    return await _load(_details, product_id, loader)
+
+
+async def listing(key: tuple, loader) -> CachedResponse:
+    return await _load(_listings, key, loader)
+
+
+def invalidate(*product_ids):
+    """Forget ``product_ids`` and all listings; call after committing product writes."""
+    global _generation
+    _generation += 1
+    for product_id in product_ids:
+        _details.delete(product_id)
+    _listings.clear()
+    # Loads already running may have read the old row; later requests must not join them.
+    _inflight.clear()
+
+
+def stats() -> dict:
+    return {"generation": _generation, "in_flight": len(_inflight), "coalesced": _coalesced}
@@ -0,0 +1,122 @@
+"""Streaming catalog export.
+
+The whole ``products`` table (or the rows changed since ``updated_since``) is
+read through a server-side cursor, ``catalog_export_batch_size`` plain row
+tuples at a time, and each batch is encoded and written to the response
+before the next one is fetched, so memory stays flat however large the
+catalog is. With ``Accept-Encoding: gzip`` the stream is compressed on the
+fly.
+
+For incremental pulls, keep the largest ``updated_at`` seen and pass it back
+as ``updated_since``. ``updated_at`` is the writer's clock when it wrote the
+row, not when the transaction committed, so a row can become visible (on the
+primary after a long transaction, or on a lagging replica) stamped earlier
+than a watermark already handed out. The server therefore goes back
+``catalog_export_overlap_seconds`` before ``updated_since``; rows near the
+watermark are sent again and should be applied idempotently, by id.
+Deletions do not show up in incremental exports, and rows not written since
+``updated_at`` was added only appear in full ones.
+
+Rows are read from the replica when it passes the same health check as
+``get_read_db``, else from the primary.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import orjson
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core import database
+from app.core.config import settings
+from app.core.serialization import columns_for
+from app.products import models, schemas
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EXPORT_COLUMNS = [*columns_for(schemas.ProductOut, models.Product), models.Product.updated_at]
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def export_query(updated_since: Optional[datetime] = None):
+    query = select(*EXPORT_COLUMNS)
+    if updated_since is None:
+        return query.order_by(models.Product.id)
+    if updated_since.tzinfo is not None:
+        # updated_at is stored as naive UTC.
+        updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+    updated_since -= timedelta(seconds=settings.catalog_export_overlap_seconds)
+    return (
+        query.where(models.Product.updated_at >= updated_since)
+        .order_by(models.Product.updated_at, models.Product.id)
+    )
+
+
+async def _batches(query):
+    """Lists of row tuples from a server-side cursor, on a session of our own.
+
+    The request's session is closed once the handler returns, before a
+    streaming body is sent.
+    """
+    query = query.execution_options(yield_per=settings.catalog_export_batch_size)
+    db = await database.open_read_session()
+    try:
+        if database.AsyncSessionLocal is None:
+            partitions = (await db.execute(query)).partitions()
+            while rows := await run_in_threadpool(next, partitions, None):
+                yield rows
+        else:
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                yield rows
+    finally:
+        await db.close()
+
+
+def _ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(FIELDS, row))) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream(query, format: str, compress: bool):
+    """Encoded (and optionally gzipped) chunks of the rows ``query`` selects."""
+    compressor = zlib.compressobj(settings.catalog_export_gzip_level, wbits=zlib.MAX_WBITS | 16) if compress else None
+
+    def encode(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None else data
+
+    if format == "csv":
+        # The header goes out even when no row matches.
+        header = encode(_csv([], header=True))
+        if header:
+            yield header
+    async for rows in _batches(query):
+        chunk = encode(_csv(rows) if format == "csv" else _ndjson(rows))
+        # zlib holds back small inputs; nothing to send until it emits.
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def accepts_gzip(header: Optional[str]) -> bool:
+    for coding in (header or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
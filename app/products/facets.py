@@ -0,0 +1,160 @@
+"""Category counts and price histograms from a precomputed aggregate.
+
+``product_facets`` holds one row per (category, price bucket) with the number
+of products and of products in stock. Every code path that writes products
+(admin create / update / delete, batch update, bulk import and checkout)
+records what it changes in a ``FacetChanges`` and applies it, as one
+``INSERT ... ON CONFLICT DO UPDATE`` of relative increments, in the same
+transaction as the product write. ``/products/facets`` then reads a table
+whose size depends only on the number of categories and buckets, never
+scanning ``products``.
+
+Price filters are applied at bucket granularity: a bucket counts when its
+range overlaps ``[min_price, max_price]``. Each facet ignores its own filter,
+so the category counts keep showing the other categories and the histogram
+the other price ranges.
+
+``python -m app.products.facets`` rebuilds the table from ``products``; run it
+after changing ``facet_price_buckets``.
+"""
+import argparse
+import asyncio
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, text
+
+from app.core import database
+from app.core.config import settings
+from app.products.models import Product, ProductFacet
+
+EDGES = sorted(settings.facet_price_buckets)
+
+
+def price_floor(price: float) -> float:
+    return EDGES[max(0, bisect_right(EDGES, price) - 1)]
+
+
+class FacetChanges:
+    """Net per-bucket count changes of one transaction."""
+
+    def __init__(self):
+        # (category, price floor) -> [product delta, in-stock delta]
+        self._deltas = defaultdict(lambda: [0, 0])
+
+    def _record(self, category, price, stock, sign: int):
+        delta = self._deltas[(category or "", price_floor(price))]
+        delta[0] += sign
+        if stock > 0:
+            delta[1] += sign
+
+    def add(self, category, price, stock):
+        self._record(category, price, stock, 1)
+
+    def remove(self, category, price, stock):
+        self._record(category, price, stock, -1)
+
+    async def apply(self, db):
+        rows = [
+            {"category": category, "price_floor": floor, "product_count": products, "in_stock_count": in_stock}
+            for (category, floor), (products, in_stock) in self._deltas.items()
+            if products or in_stock
+        ]
+        self._deltas.clear()
+        if not rows:
+            return
+        stmt = database.upsert_insert(ProductFacet).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[ProductFacet.category, ProductFacet.price_floor],
+            set_={
+                "product_count": ProductFacet.product_count + stmt.excluded.product_count,
+                "in_stock_count": ProductFacet.in_stock_count + stmt.excluded.in_stock_count,
+            },
+        ))
+
+
+def _overlaps(floor: float, min_price: Optional[float], max_price: Optional[float]) -> bool:
+    index = EDGES.index(floor) if floor in EDGES else None
+    ceiling = EDGES[index + 1] if index is not None and index + 1 < len(EDGES) else None
+    if min_price is not None and ceiling is not None and ceiling <= min_price:
+        return False
+    if max_price is not None and floor > max_price:
+        return False
+    return True
+
+
+async def lookup(db, category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                 in_stock: bool) -> dict:
+    count = ProductFacet.in_stock_count if in_stock else ProductFacet.product_count
+    rows = (await db.execute(
+        select(ProductFacet.category, ProductFacet.price_floor, count.label("count")).where(count > 0)
+    )).all()
+
+    categories = defaultdict(int)
+    histogram = defaultdict(int)
+    for row in rows:
+        if _overlaps(row.price_floor, min_price, max_price):
+            categories[row.category] += row.count
+        if category is None or row.category == category:
+            histogram[row.price_floor] += row.count
+
+    buckets = []
+    for i, floor in enumerate(EDGES):
+        ceiling = EDGES[i + 1] if i + 1 < len(EDGES) else None
+        buckets.append({"min": floor, "max": ceiling, "count": histogram.pop(floor, 0)})
+    return {
+        "categories": [
+            {"category": name or None, "count": n}
+            for name, n in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "price_histogram": buckets,
+    }
+
+
+async def rebuild(db) -> int:
+    """Recompute every bucket from ``products``; the caller commits."""
+    # Bucket in a subquery so GROUP BY names columns rather than repeating
+    # expressions whose bound literals Postgres would not match up.
+    bucketed = select(
+        func.coalesce(Product.category, "").label("category"),
+        case(*[(Product.price >= edge, edge) for edge in reversed(EDGES[1:])], else_=EDGES[0]).label("price_floor"),
+        Product.stock,
+    ).subquery()
+    if database.engine.dialect.name == "postgresql":
+        # Writers block on their facet upsert until this commits, and then
+        # add their change on top of counts that did not include it.
+        await db.execute(text("LOCK TABLE product_facets IN EXCLUSIVE MODE"))
+    await db.execute(delete(ProductFacet))
+    await db.execute(insert(ProductFacet).from_select(
+        ["category", "price_floor", "product_count", "in_stock_count"],
+        select(bucketed.c.category, bucketed.c.price_floor, func.count(),
+               func.sum(case((bucketed.c.stock > 0, 1), else_=0)))
+        .group_by(bucketed.c.category, bucketed.c.price_floor),
+    ))
+    return await db.scalar(select(func.count()).select_from(ProductFacet))
+
+
+async def rebuild_table() -> int:
+    """For scripts: rebuild on a session of its own, commit and dispose the async engine."""
+    db = database.new_session()
+    try:
+        buckets = await rebuild(db)
+        await db.commit()
+    finally:
+        await db.close()
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+    return buckets
+
+
+async def _main():
+    buckets = await rebuild_table()
+    print(f"Rebuilt product_facets: {buckets} buckets")
+
+
+if __name__ == "__main__":
+    import app.auth.models, app.cart.models, app.orders.models  # noqa: E401,F401
+
+    argparse.ArgumentParser(description="Rebuild the product_facets aggregate from products.").parse_args()
+    asyncio.run(_main())
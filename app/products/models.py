@@ -1,14 +1,41 @@
-from sqlalchemy import Column, Integer, String, Float
+import datetime
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from app.core.database import Base
 #from app.orders.models import OrderItem 
 
 class Product(Base):
     __tablename__ = "products"
+    # Back the category filter and the keyset sorts of the public listing.
+    __table_args__ = (
+        Index("ix_products_category_id", "category", "id"),
+        Index("ix_products_category_price_id", "category", "price", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        # Incremental catalog exports (?updated_since=).
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    # Supplier / external key used by the bulk import to upsert.
+    sku = Column(String, unique=True, index=True)
     name = Column(String, nullable=False)
     description = Column(String)
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
     category = Column(String)
     image_url = Column(String)
+    # NULL for rows not written since this column was added.
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class ProductFacet(Base):
+    """Product counts per (category, price bucket), kept current by every product writer."""
+    __tablename__ = "product_facets"
+
+    # '' for products without a category, so the key never contains NULL.
+    category = Column(String, primary_key=True)
+    # Lower edge of the price bucket (see settings.facet_price_buckets).
+    price_floor = Column(Float, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    in_stock_count = Column(Integer, nullable=False, default=0)
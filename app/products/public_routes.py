@@ -1,55 +1,123 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.deps import get_db
-from app.products import models, schemas
+from app.core import pagination
+from app.core.config import settings
+from app.core.deps import get_read_db
+from app.core.serialization import columns_for
+from app.products import autocomplete, catalog_cache, facets, models, schemas, search
+from app.monitoring.query_budget import query_budget
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+PRODUCT_COLUMNS = columns_for(schemas.ProductOut, models.Product)
+
+
+SORT_KEYS = {
+    None: (models.Product.id,),
+    "price": (models.Product.price, models.Product.id),
+    "name": (models.Product.name, models.Product.id),
+}
+
 
 @router.get("/", response_model=List[schemas.ProductOut])
-def list_products(
-    db: Session = Depends(get_db),
+@query_budget(3)
+async def list_products(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     sort_by: Optional[str] = Query(None, enum=["price", "name"]),
     page: int = 1,
     page_size: int = 10,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; overrides page"),
 ):
-    query = db.query(models.Product)
+    key_columns = SORT_KEYS[sort_by]
+    seek_values = pagination.decode_cursor(cursor, sort_by, len(key_columns)) if cursor else None
+
+    async def load():
+        query = select(*PRODUCT_COLUMNS)
+        if category:
+            query = query.filter(models.Product.category == category)
+        if min_price is not None:
+            query = query.filter(models.Product.price >= min_price)
+        if max_price is not None:
+            query = query.filter(models.Product.price <= max_price)
+        estimate = await pagination.estimate_count(db, query)
 
-    if category:
-        query = query.filter(models.Product.category == category)
-    if min_price is not None:
-        query = query.filter(models.Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(models.Product.price <= max_price)
-    if sort_by == "price":
-        query = query.order_by(models.Product.price)
-    elif sort_by == "name":
-        query = query.order_by(models.Product.name)
+        query = query.order_by(*key_columns)
+        if seek_values is not None:
+            query = pagination.seek(query, key_columns, seek_values)
+        else:
+            query = query.offset((page - 1) * page_size)
+        rows = (await db.execute(query.limit(page_size))).all()
+        key_attrs = [column.key for column in key_columns]
+        return catalog_cache.render(schemas.ProductOut, rows, headers=pagination.headers(
+            pagination.next_cursor(sort_by, rows, key_attrs, page_size), estimate
+        ))
 
-    products = query.offset((page - 1) * page_size).limit(page_size).all()
-    return products
+    key = (category or None, min_price, max_price, sort_by, None if cursor else page, page_size, cursor)
+    return catalog_cache.respond(request, await catalog_cache.listing(key, load))
 
 
 @router.get("/search", response_model=List[schemas.ProductOut])
-def search_products(
+@query_budget(2)
+async def search_products(
+    request: Request,
     keyword: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=settings.search_max_page_size),
+    db: AsyncSession = Depends(get_read_db)
+):
+    offset = (page - 1) * page_size
+    if search.use_postgres():
+        query, rank = search.ranked_query(keyword)
+        query = query.order_by(rank.desc(), models.Product.id).offset(offset).limit(page_size)
+        rows = (await db.execute(query.with_only_columns(*PRODUCT_COLUMNS))).all()
+        return catalog_cache.respond(request, catalog_cache.render(schemas.ProductOut, rows))
+
+    await search.index.ensure_built()
+    ids = search.index.search(keyword, offset, page_size)
+    rows = []
+    if ids:
+        position = {product_id: i for i, product_id in enumerate(ids)}
+        query = select(*PRODUCT_COLUMNS).where(models.Product.id.in_(ids))
+        rows = (await db.execute(query)).all()
+        rows.sort(key=lambda row: position[row.id])
+    return catalog_cache.respond(request, catalog_cache.render(schemas.ProductOut, rows))
+
+
+@router.get("/facets", response_model=schemas.ProductFacets)
+@query_budget(2)
+async def product_facets(
+    db: AsyncSession = Depends(get_read_db),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
 ):
-    results = db.query(models.Product).filter(
-        models.Product.name.ilike(f"%{keyword}%") |
-        models.Product.description.ilike(f"%{keyword}%")
-    ).all()
+    return await facets.lookup(db, category, min_price, max_price, in_stock)
 
-    return results
+
+@router.get("/autocomplete", response_model=schemas.Autocomplete)
+@query_budget(0)
+async def autocomplete_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=settings.autocomplete_max_limit),
+):
+    await autocomplete.index.ensure_built()
+    return autocomplete.index.complete(q, limit)
 
 
 @router.get("/{id}", response_model=schemas.ProductOut)
-def get_product_detail(id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+@query_budget(2)
+async def get_product_detail(id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def load():
+        row = (await db.execute(select(*PRODUCT_COLUMNS).where(models.Product.id == id))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return catalog_cache.render(schemas.ProductOut, row, many=False)
+
+    return catalog_cache.respond(request, await catalog_cache.product(id, load))
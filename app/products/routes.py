@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from datetime import datetime
+from typing import List, Optional
+from app.core import pagination
+from app.core.config import settings
 from app.core.deps import get_db, require_admin
-from . import models, schemas
+from . import autocomplete, batch, bulk_import, catalog_cache, export, facets, models, schemas, search
 from app.orders.models import OrderItem
+from app.monitoring.query_budget import query_budget
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +20,24 @@ router = APIRouter(prefix="/admin/products", tags=["Admin Products"])
 
 
 @router.post("/create", response_model=schemas.ProductOut, status_code=status.HTTP_201_CREATED)
-def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db), admin=Depends(require_admin)):
+@query_budget(3)
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
     try:
-        db_product = models.Product(**product.dict())
+        db_product = models.Product(**product.model_dump())
         db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
+        changes = facets.FacetChanges()
+        changes.add(db_product.category, db_product.price, db_product.stock)
+        await changes.apply(db)
+        await db.commit()
+        await db.refresh(db_product)
+        search.index.upsert(db_product)
+        autocomplete.index.upsert(db_product)
+        catalog_cache.invalidate(db_product.id)
         logger.info(f"Product created: {db_product.name} (ID: {db_product.id})")
         return db_product
+    except IntegrityError:
+        logger.warning("Duplicate SKU while creating product")
+        raise HTTPException(status_code=409, detail="A product with this SKU already exists")
     except SQLAlchemyError as e:
         logger.exception("Database error while creating product")
         raise HTTPException(status_code=500, detail="Database error")
@@ -31,11 +48,61 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 
+@router.post("/import")
+@query_budget(None)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, enum=list(bulk_import.FORMATS), description="default: from Content-Type"),
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(require_admin),
+):
+    """Upsert products by SKU from a streamed CSV or NDJSON body (gzip allowed)."""
+    try:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = format or bulk_import.CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+        chunks = request.stream()
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            chunks = bulk_import.gunzip(chunks)
+        report = await bulk_import.import_products(db, bulk_import.PARSERS[format](chunks))
+        return report.as_dict()
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    except SQLAlchemyError:
+        logger.exception("Database error while importing products")
+        raise HTTPException(status_code=500, detail="Database error")
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception:
+        logger.exception("Unexpected error while importing products")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
 @router.get("/list", response_model=List[schemas.ProductOut])
-def list_products(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), admin=Depends(require_admin)):
+@query_budget(2)
+async def list_products(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; overrides skip"),
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(require_admin),
+):
     try:
-        products = db.query(models.Product).offset(skip).limit(limit).all()
-        logger.info(f"{len(products)} products fetched (skip={skip}, limit={limit})")
+        query = select(models.Product)
+        estimate = await pagination.estimate_count(db, query)
+        query = query.order_by(models.Product.id)
+        if cursor:
+            (last_id,) = pagination.decode_cursor(cursor, "id", 1)
+            query = query.where(models.Product.id > last_id)
+        else:
+            query = query.offset(skip)
+        products = (await db.scalars(query.limit(limit))).all()
+        response.headers.update(pagination.headers(
+            pagination.next_cursor("id", products, ["id"], limit), estimate
+        ))
+        logger.info(f"{len(products)} products fetched (skip={skip}, cursor={cursor is not None}, limit={limit})")
         return products
     except SQLAlchemyError:
         logger.exception("Database error while listing products")
@@ -47,10 +114,35 @@ def list_products(skip: int = 0, limit: int = 10, db: Session = Depends(get_db),
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 
+@router.get("/export")
+@query_budget(1)
+async def export_products(
+    request: Request,
+    format: str = Query("ndjson", enum=list(export.FORMATS)),
+    updated_since: Optional[datetime] = Query(None, description="Only products written at or after this time, less catalog_export_overlap_seconds"),
+    admin=Depends(require_admin),
+):
+    """Stream the catalog as NDJSON or CSV; gzipped when the client accepts it."""
+    compress = export.accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f'attachment; filename="products.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    logger.info(f"Catalog export started (format={format}, updated_since={updated_since}, gzip={compress})")
+    return StreamingResponse(
+        export.stream(export.export_query(updated_since), format, compress),
+        media_type=export.FORMATS[format],
+        headers=headers,
+    )
+
+
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
+@query_budget(1)
+async def get_product(product_id: int, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
     try:
-        product = db.query(models.Product).get(product_id)
+        product = await db.get(models.Product, product_id)
         if not product:
             logger.warning(f"Product not found (ID: {product_id})")
             raise HTTPException(status_code=404, detail="Product not found")
@@ -67,20 +159,32 @@ def get_product(product_id: int, db: Session = Depends(get_db), admin=Depends(re
 
 
 @router.put("/{product_id}", response_model=schemas.ProductOut)
-def update_product(product_id: int, updates: schemas.ProductUpdate, db: Session = Depends(get_db), admin=Depends(require_admin)):
+@query_budget(4)
+async def update_product(product_id: int, updates: schemas.ProductUpdate, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
     try:
-        product = db.query(models.Product).get(product_id)
+        # Locked so the facet counts move from the row's current values.
+        product = await db.get(models.Product, product_id, with_for_update=True)
         if not product:
             logger.warning(f"Product not found for update (ID: {product_id})")
             raise HTTPException(status_code=404, detail="Product not found")
 
-        for key, value in updates.dict(exclude_unset=True).items():
+        changes = facets.FacetChanges()
+        changes.remove(product.category, product.price, product.stock)
+        for key, value in updates.model_dump(exclude_unset=True).items():
             setattr(product, key, value)
+        changes.add(product.category, product.price, product.stock)
+        await changes.apply(db)
 
-        db.commit()
-        db.refresh(product)
+        await db.commit()
+        await db.refresh(product)
+        search.index.upsert(product)
+        autocomplete.index.upsert(product)
+        catalog_cache.invalidate(product.id)
         logger.info(f"Product updated: {product.name} (ID: {product.id})")
         return product
+    except IntegrityError:
+        logger.warning("Duplicate SKU while updating product")
+        raise HTTPException(status_code=409, detail="A product with this SKU already exists")
     except SQLAlchemyError:
         logger.exception("Database error while updating product")
         raise HTTPException(status_code=500, detail="Database error")
@@ -91,20 +195,69 @@ def update_product(product_id: int, updates: schemas.ProductUpdate, db: Session
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 
+@router.patch("/batch")
+@query_budget(None)
+async def batch_update_products(
+    items: List[schemas.ProductBatchItem], db: AsyncSession = Depends(get_db), admin=Depends(require_admin)
+):
+    """Apply many partial updates in one transaction, one statement per set of changed fields."""
+    try:
+        if len(items) > settings.product_batch_max_items:
+            raise HTTPException(
+                status_code=413, detail=f"At most {settings.product_batch_max_items} items per batch"
+            )
+        updated, missing = await batch.apply(db, items)
+        await db.commit()
+        for row in updated:
+            search.index.upsert(row)
+            autocomplete.index.upsert(row)
+        updated_ids = {row.id for row in updated}
+        catalog_cache.invalidate(*updated_ids)
+
+        missing = set(missing)
+        results = []
+        for product_id in dict.fromkeys(item.id for item in items):
+            if product_id in updated_ids:
+                outcome = "updated"
+            elif product_id in missing:
+                outcome = "not_found"
+            else:
+                outcome = "unchanged"
+            results.append({"id": product_id, "status": outcome})
+        logger.info(f"Batch product update: {len(updated_ids)} updated, {len(missing)} not found")
+        return {"updated": len(updated_ids), "not_found": len(missing), "results": results}
+    except SQLAlchemyError:
+        logger.exception("Database error while batch updating products")
+        raise HTTPException(status_code=500, detail="Database error")
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception:
+        logger.exception("Unexpected error while batch updating products")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
 @router.delete("/{product_id}", status_code=status.HTTP_200_OK)
-def delete_product(product_id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
+@query_budget(4)
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
     try:
-        product = db.query(models.Product).get(product_id)
+        # Locked so the facet counts move from the row's current values.
+        product = await db.get(models.Product, product_id, with_for_update=True)
         if not product:
             logger.warning(f"Product not found for deletion (ID: {product_id})")
             raise HTTPException(status_code=404, detail="Product not found")
 
-        if db.query(OrderItem).filter(OrderItem.product_id == product_id).first():
+        if await db.scalar(select(OrderItem.id).where(OrderItem.product_id == product_id).limit(1)):
             logger.warning(f"Attempt to delete product in use (ID: {product_id})")
             raise HTTPException(status_code=400, detail="Product cannot be deleted as it is part of an order")
 
-        db.delete(product)
-        db.commit()
+        await db.delete(product)
+        changes = facets.FacetChanges()
+        changes.remove(product.category, product.price, product.stock)
+        await changes.apply(db)
+        await db.commit()
+        search.index.remove(product_id)
+        autocomplete.index.remove(product_id)
+        catalog_cache.invalidate(product_id)
         logger.info(f"Product deleted successfully (ID: {product_id})")
         return {"message": "Product deleted successfully"}
     except SQLAlchemyError:
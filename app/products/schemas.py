@@ -1,7 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import List, Optional
 
 class ProductBase(BaseModel):
+    sku: Optional[str] = None
     name: str
     description: Optional[str] = None
     price: float
@@ -12,30 +13,65 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     pass
 
+class ProductImport(ProductCreate):
+    """One row of a bulk import; the SKU is required so rows can be upserted."""
+    sku: str = Field(min_length=1)
+
 class ProductUpdate(BaseModel):
+    sku: Optional[str] = None
     name: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
     stock: Optional[int] = None
     category: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+class ProductBatchItem(BaseModel):
+    """One entry of ``PATCH /admin/products/batch``; only the fields sent are changed."""
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None
+    category: Optional[str] = None
+    image_url: Optional[str] = None
 
-# class ProductOut(ProductBase):
-#     id: int
+    @model_validator(mode="after")
+    def _required_not_null(self):
+        for name in ("name", "price", "stock"):
+            if name in self.model_fields_set and getattr(self, name) is None:
+                raise ValueError(f"{name} cannot be null")
+        return self
 
-#     class Config:
-#         orm_mode = True
-    
 class ProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
+    sku: Optional[str] = None
     name: str
-    description: str
+    description: Optional[str] = None
     price: float
     stock: int
-    category: str
+    category: Optional[str] = None
     image_url: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+class CategoryCount(BaseModel):
+    category: Optional[str] = None
+    count: int
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+class ProductFacets(BaseModel):
+    categories: List[CategoryCount]
+    price_histogram: List[PriceBucket]
+
+class AutocompleteProduct(BaseModel):
+    id: int
+    name: str
+    category: Optional[str] = None
+
+class Autocomplete(BaseModel):
+    products: List[AutocompleteProduct]
+    categories: List[str]
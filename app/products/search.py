@@ -0,0 +1,188 @@
+"""Ranked full-text product search.
+
+On PostgreSQL, search runs against the generated ``products.search_vector``
+column (name weighted A, description weighted B) through its GIN index, and
+ranks with ``ts_rank_cd``; the query string goes through
+``websearch_to_tsquery`` so quoted phrases, ``or`` and ``-term`` behave as
+users expect.
+
+Other databases (SQLite in development) use ``ProductSearchIndex``, an
+in-process inverted index with BM25 scoring over the same two fields. It is
+built from the products table on first use and kept current by the admin
+product routes calling ``index.upsert`` / ``index.remove`` after they commit.
+Writes made by other processes are not seen until a restart, so this backend
+is for single-process development only.
+"""
+import asyncio
+import logging
+import math
+import re
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sqlalchemy import func, literal_column, select
+
+from app.core import database
+from app.core.config import settings
+from app.monitoring import metrics
+from app.products import models
+
+logger = logging.getLogger(__name__)
+
+# Inlined rather than bound so the planner sees a constant regconfig.
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+search_vector = literal_column("products.search_vector")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has in is it its of on or that the this to was with".split()
+)
+
+# Name matches count for more than description matches, as with the A/B weights in Postgres.
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def terms(text) -> list:
+    """Lowercase word tokens without stopwords, with a plural ``s`` stripped."""
+    words = []
+    for word in _TOKEN.findall((text or "").lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def use_postgres() -> bool:
+    if settings.search_backend == "auto":
+        return database.engine.dialect.name == "postgresql"
+    return settings.search_backend == "postgres"
+
+
+def ranked_query(keyword: str):
+    """``(statement, rank)`` matching ``keyword``; order and paginate the statement."""
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, keyword)
+    rank = func.ts_rank_cd(search_vector, query)
+    stmt = select(models.Product).where(search_vector.op("@@")(query))
+    return stmt, rank
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        # term -> {product_id: weighted term frequency}
+        self._postings = defaultdict(dict)
+        # product_id -> (weighted document length, terms it was indexed under)
+        self._docs = {}
+        self._total_length = 0.0
+        # Writes made while the initial load reads the table, replayed onto it
+        self._journal = None
+        self._lock = asyncio.Lock()
+        self.ready = False
+
+    def upsert(self, product):
+        if self._journal is not None:
+            self._journal.append(SimpleNamespace(id=product.id, name=product.name, description=product.description))
+        if self.ready:
+            self._index(product)
+
+    def _index(self, product):
+        self._remove(product.id)
+        frequencies = defaultdict(float)
+        for term in terms(product.name):
+            frequencies[term] += NAME_WEIGHT
+        for term in terms(product.description):
+            frequencies[term] += DESCRIPTION_WEIGHT
+        for term, tf in frequencies.items():
+            self._postings[term][product.id] = tf
+        length = sum(frequencies.values())
+        self._docs[product.id] = (length, tuple(frequencies))
+        self._total_length += length
+
+    def remove(self, product_id: int):
+        if self._journal is not None:
+            self._journal.append(product_id)
+        if self.ready:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        length, doc_terms = doc
+        self._total_length -= length
+        for term in doc_terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    async def ensure_built(self):
+        if self.ready:
+            return
+        async with self._lock:
+            if self.ready:
+                return
+            # A one-off warm-up, not the cost of whichever request triggered it.
+            self._journal = []
+            try:
+                with metrics.untracked():
+                    db = await database.open_read_session()
+                    try:
+                        rows = (await db.execute(
+                            select(models.Product.id, models.Product.name, models.Product.description)
+                        )).all()
+                    finally:
+                        await db.close()
+                journal = self._journal
+            finally:
+                self._journal = None
+            for row in rows:
+                self._index(row)
+            # The snapshot may predate writes committed while it was read.
+            for entry in journal:
+                if isinstance(entry, int):
+                    self._remove(entry)
+                else:
+                    self._index(entry)
+            self.ready = True
+            logger.info(f"Product search index built: {len(self._docs)} products, {len(self._postings)} terms")
+
+    def search(self, keyword: str, offset: int, limit: int) -> list:
+        """Product ids matching every term of ``keyword``, best first."""
+        query_terms = list(dict.fromkeys(terms(keyword)))
+        if not query_terms or not self._docs:
+            return []
+        postings = [self._postings.get(term) for term in query_terms]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                return []
+
+        n = len(self._docs)
+        avg_length = self._total_length / n
+        scores = {}
+        for p in postings:
+            idf = math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for product_id in candidates:
+                tf = p[product_id]
+                length = self._docs[product_id][0]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[product_id] = scores.get(product_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return ranked[offset:offset + limit]
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "products": len(self._docs), "terms": len(self._postings)}
+
+
+index = ProductSearchIndex()
@@ -0,0 +1,100 @@
+"""Latency check for the ``/products/autocomplete`` prefix index.
+
+Builds the in-process index from a synthetic catalog (the same generator as
+``benchmarks.seed``, so no database is needed) and replays keystrokes: every
+prefix of randomly picked product names, one to four words long. Between
+keystrokes it renames a product, records a sale or deletes a product, so
+cached results keep being dropped and most lookups are cold, as in
+production. Fails (exit code 1) if the p99 lookup exceeds ``--budget-ms``.
+
+    python -m benchmarks.autocomplete_check --products 500000 --budget-ms 5
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from app.products import autocomplete
+from benchmarks import seed
+from benchmarks.common import run_metadata, summarize, write_report
+
+
+def keystrokes(rng, names, count):
+    """Query strings as typed, character by character, into the search box."""
+    typed = 0
+    while typed < count:
+        text = " ".join(autocomplete.words(rng.choice(names))[:rng.randint(1, 4)])
+        for end in range(1, len(text) + 1):
+            if text[end - 1] != " ":
+                yield text[:end]
+                typed += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--orders", type=int, default=50_000, help="orders whose lines rank the products")
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--writes-per-query", type=float, default=0.2)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="p99 lookup latency to stay under")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    rng = random.Random(args.seed)
+    rows = [(n + 1, p["name"], p["category"]) for n, p in enumerate(seed.generate_products(rng, args.products))]
+    sales = Counter()
+    for _ in range(args.orders):
+        for product_id in rng.sample(range(1, args.products + 1), rng.randint(1, 4)):
+            sales[product_id] += rng.randint(1, 3)
+
+    index = autocomplete.index
+    started = time.perf_counter()
+    index.load(rows, sales.items())
+    build_s = time.perf_counter() - started
+
+    names = [name for _, name, _ in rows]
+    next_id = args.products + 1
+    lookups, writes = [], []
+    for query in keystrokes(rng, names, args.queries):
+        if rng.random() < args.writes_per_query:
+            choice = rng.random()
+            product_id = rng.randint(1, next_id - 1)
+            if choice < 0.2:
+                product_id = next_id
+                next_id += 1
+            product = SimpleNamespace(id=product_id, **next(seed.generate_products(rng, 1)))
+            started = time.perf_counter()
+            if choice < 0.6:
+                index.upsert(product)
+            elif choice < 0.9:
+                index.record_sale(product_id, rng.randint(1, 3))
+            else:
+                index.remove(product_id)
+            writes.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        index.complete(query, args.limit)
+        lookups.append(time.perf_counter() - started)
+
+    report = {
+        "meta": run_metadata(**{k: v for k, v in vars(args).items() if k != "output"}),
+        "products": args.products,
+        "build_s": build_s,
+        "index": index.stats(),
+        "lookup": summarize(lookups, sum(lookups)),
+        "write": summarize(writes, sum(writes)),
+        "budget_ms": args.budget_ms,
+    }
+    report["ok"] = report["lookup"]["p99_ms"] <= args.budget_ms
+    write_report(report, args.output)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Concurrent-checkout contention test with oversell verification.
+
+Creates a small set of hot products and a pool of customers, then runs
+``--processes`` worker processes, each with ``--concurrency`` async virtual
+users, that repeatedly add hot products to their cart and call
+``POST /checkout`` in-process until the stock is gone or ``--duration``
+elapses. Checkouts that fail with a 500 (deadlock, serialization failure,
+pool timeout) are retried with backoff.
+
+Reported: successful checkouts/s, checkout latency, time spent waiting on
+the ``SELECT ... FOR UPDATE`` row locks, deadlock and retry counts. The run
+fails (exit code 1) unless, for every hot product,
+
+    initial stock == current stock + quantity sold in this run, and stock >= 0.
+
+Point ``DATABASE_URL`` at a local Postgres; SQLite ignores ``FOR UPDATE`` and
+serializes writers, so it only exercises the harness.
+
+    python -m benchmarks.checkout_stress --processes 4 --concurrency 25 --products 5 --stock 2000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from sqlalchemy import func, insert, select
+
+from app.auth import utils
+from app.auth.models import RoleEnum, User
+from app.cart.models import Carts  # noqa: F401 - registers mappers referenced by User
+from app.core.database import engine
+from app.orders.models import OrderItem
+from app.products import facets
+from app.products.models import Product
+from benchmarks.common import percentile, run_metadata, write_report
+
+DEADLOCK_CODES = {"40P01", "40001"}
+
+
+def setup(args):
+    run_tag = f"stress{int(time.time())}"
+    hashed_password = utils.hash_password("stress123")
+    with engine.begin() as conn:
+        product_ids = conn.execute(
+            insert(Product.__table__).returning(Product.id, sort_by_parameter_order=True),
+            [
+                {"name": f"{run_tag} hot product {n}", "description": "stress test", "price": 10.0 + n,
+                 "stock": args.stock, "category": "stress"}
+                for n in range(args.products)
+            ],
+        ).scalars().all()
+        users = args.processes * args.concurrency
+        user_ids = conn.execute(
+            insert(User.__table__).returning(User.id, sort_by_parameter_order=True),
+            [
+                {"name": f"{run_tag} {n}", "email": f"{run_tag}u{n}@gmail.com",
+                 "hashed_password": hashed_password, "role": RoleEnum.user}
+                for n in range(users)
+            ],
+        ).scalars().all()
+    # Checkout applies facet deltas; count the new products first so they have rows to move.
+    asyncio.run(facets.rebuild_table())
+    customers = [(user_id, f"{run_tag}u{n}@gmail.com") for n, user_id in enumerate(user_ids)]
+    return list(product_ids), customers
+
+
+def verify(product_ids, initial_stock):
+    with engine.connect() as conn:
+        stock = dict(conn.execute(select(Product.id, Product.stock).where(Product.id.in_(product_ids))).all())
+        sold = dict(conn.execute(
+            select(OrderItem.product_id, func.coalesce(func.sum(OrderItem.quantity), 0))
+            .where(OrderItem.product_id.in_(product_ids))
+            .group_by(OrderItem.product_id)
+        ).all())
+    products = {}
+    ok = True
+    for product_id in product_ids:
+        remaining, units_sold = stock[product_id], int(sold.get(product_id, 0))
+        consistent = remaining >= 0 and remaining + units_sold == initial_stock
+        ok = ok and consistent
+        products[product_id] = {"stock": remaining, "sold": units_sold, "consistent": consistent}
+    return ok, products
+
+
+def worker(args, product_ids, customers, seed):
+    """Runs in a spawned process; returns raw samples for aggregation."""
+    return asyncio.run(_worker(args, product_ids, customers, seed))
+
+
+async def _worker(args, product_ids, customers, seed):
+    import httpx
+    from sqlalchemy import event
+
+    from app.core import database
+    from main import app
+
+    lock_waits = []
+    deadlocks = 0
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["stress_start"] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if "FOR UPDATE" in statement:
+            lock_waits.append(time.perf_counter() - conn.info.pop("stress_start"))
+
+    def on_error(context):
+        nonlocal deadlocks
+        code = getattr(context.original_exception, "pgcode", None) or getattr(context.original_exception, "sqlstate", None)
+        if code in DEADLOCK_CODES or "deadlock" in str(context.original_exception).lower():
+            deadlocks += 1
+
+    for eng in (database.engine, database.async_engine):
+        if eng is not None:
+            target = getattr(eng, "sync_engine", eng)
+            event.listen(target, "before_cursor_execute", before)
+            event.listen(target, "after_cursor_execute", after)
+            event.listen(target, "handle_error", on_error)
+
+    latencies = []
+    counts = {"success": 0, "sold_out": 0, "failed": 0, "retries": 0}
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + args.duration
+    sold_out = set()
+
+    async def customer(client, user_id, email):
+        claims = {"sub": email, "uid": user_id, "role": "user"}
+        headers = {"Authorization": "Bearer " + utils.create_access_token(claims)}
+        while time.perf_counter() < deadline and len(sold_out) < len(product_ids):
+            for product_id in rng.sample(product_ids, min(args.lines, len(product_ids))):
+                response = await client.post("/cart/add", headers=headers,
+                                             json={"product_id": product_id, "quantity": rng.randint(1, 3)})
+                if response.status_code == 400 and "out of stock" in response.text:
+                    sold_out.add(product_id)
+
+            for attempt in range(args.retries + 1):
+                started = time.perf_counter()
+                response = await client.post("/checkout", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code < 500:
+                    break
+                counts["retries"] += 1
+                await asyncio.sleep(0.01 * 2 ** attempt * rng.random())
+
+            if response.status_code == 201:
+                counts["success"] += 1
+            elif response.status_code == 400:
+                counts["sold_out"] += 1
+                # Empty the cart so the next round starts clean.
+                for item in (await client.get("/cart", headers=headers)).json():
+                    await client.delete(f"/cart/{item['id']}", headers=headers)
+            else:
+                counts["failed"] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=60) as client:
+        await asyncio.gather(*(customer(client, user_id, email) for user_id, email in customers))
+
+    for eng in (database.async_engine,):
+        if eng is not None:
+            await eng.dispose()
+    return {"latencies": latencies, "lock_waits": lock_waits, "deadlocks": deadlocks, **counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users per process")
+    parser.add_argument("--products", type=int, default=5, help="number of hot products shared by all carts")
+    parser.add_argument("--stock", type=int, default=1000, help="initial stock of each hot product")
+    parser.add_argument("--lines", type=int, default=2, help="hot products per cart")
+    parser.add_argument("--duration", type=float, default=60.0, help="upper bound in seconds")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    product_ids, customers = setup(args)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.processes, mp_context=get_context("spawn")) as pool:
+        futures = [
+            pool.submit(worker, args, product_ids, customers[n::args.processes], n)
+            for n in range(args.processes)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(x for r in results for x in r["latencies"])
+    lock_waits = sorted(x for r in results for x in r["lock_waits"])
+    totals = {key: sum(r[key] for r in results) for key in ("success", "sold_out", "failed", "retries", "deadlocks")}
+    ok, products = verify(product_ids, args.stock)
+
+    report = {
+        "meta": run_metadata(**{k: v for k, v in vars(args).items() if k != "output"}),
+        "elapsed_s": elapsed,
+        "checkouts_per_s": totals["success"] / elapsed if elapsed else 0.0,
+        **totals,
+        "checkout_latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        },
+        "lock_wait_ms": {
+            "count": len(lock_waits),
+            "total": sum(lock_waits) * 1000,
+            "p50": percentile(lock_waits, 50) * 1000,
+            "p95": percentile(lock_waits, 95) * 1000,
+            "p99": percentile(lock_waits, 99) * 1000,
+            "max": lock_waits[-1] * 1000 if lock_waits else 0.0,
+        },
+        "invariant_ok": ok,
+        "products": products,
+    }
+    write_report(report, args.output)
+    if not ok:
+        print("OVERSELL DETECTED: stock + sold != initial stock", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
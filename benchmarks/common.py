@@ -0,0 +1,84 @@
+"""Shared helpers for the benchmark scripts: latency recording and JSON reports."""
+import json
+import math
+import platform
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from app.core.config import settings
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "throughput_per_s": len(values) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+class Recorder:
+    """Collects per-endpoint latencies and status codes."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, seconds, status):
+        self.latencies[name].append(seconds)
+        self.statuses[name][str(status)] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        all_latencies = []
+        for name, values in sorted(self.latencies.items()):
+            statuses = dict(self.statuses[name])
+            errors = sum(n for code, n in statuses.items() if not code.startswith(("2", "3")))
+            endpoints[name] = {**summarize(values, elapsed), "errors": errors, "statuses": statuses}
+            all_latencies.extend(values)
+        return {"elapsed_s": elapsed, "overall": summarize(all_latencies, elapsed), "endpoints": endpoints}
+
+
+def run_metadata(**extra):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "db_mode": settings.db_mode,
+        **extra,
+    }
+
+
+def write_report(report, path=None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,43 @@
+"""Compare two benchmark reports endpoint by endpoint.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+COLUMNS = ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before, after):
+    if not before:
+        return "    n/a"
+    return f"{(after - before) / before * 100:+6.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    header = f"{'endpoint':<28}" + "".join(f"{col:>26}" for col in COLUMNS)
+    print(header)
+    rows = [("overall", before["overall"], after["overall"])]
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        rows.append((name, before["endpoints"].get(name, {}), after["endpoints"].get(name, {})))
+    for name, old, new in rows:
+        cells = []
+        for col in COLUMNS:
+            o, n = old.get(col, 0.0), new.get(col, 0.0)
+            cells.append(f"{o:9.1f} -> {n:9.1f} {change(o, n)}")
+        print(f"{name:<28}" + "".join(f"{cell:>26}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""HTTP load scenarios against the API, in-process or over the network.
+
+Each virtual user signs in as one of the seeded ``bench<n>@gmail.com``
+accounts and then loops over weighted steps of the chosen scenario until the
+duration elapses. Results are written as JSON with throughput and latency
+percentiles per endpoint, tagged with the current git commit.
+
+    python -m benchmarks.load --scenario mixed --concurrency 50 --duration 60 --output before.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --scenario browse
+
+Seed the database first with ``python -m benchmarks.seed``.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import func, select
+
+from app.auth.models import User
+from app.cart.models import Carts  # noqa: F401 - registers mappers referenced by User
+from app.core.database import engine
+from app.orders.models import Order  # noqa: F401
+from app.products.models import Product
+from benchmarks.common import Recorder, run_metadata, write_report
+
+KEYWORDS = ["lamp", "wireless", "black", "chair", "premium", "mug", "guitar", "eco", "speaker", "tent"]
+CATEGORIES = ["electronics", "books", "clothing", "home", "garden", "toys", "sports"]
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, rng, max_product_id):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.max_product_id = max_product_id
+        self.headers = {}
+
+    async def request(self, name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, "error"
+        self.recorder.record(name, time.perf_counter() - started, status)
+        return response
+
+    async def sign_in(self, email, password):
+        # Every virtual user signs in from the same address, so a remote
+        # server's signin limiter throttles the warm-up; wait it out.
+        while True:
+            response = await self.client.post("/auth/signin", json={"email": email, "password": password})
+            if response.status_code not in (429, 503):
+                break
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def product_id(self):
+        # Skewed towards low ids so a hot set of products emerges.
+        return min(self.max_product_id, int(self.rng.paretovariate(1.2))) if self.rng.random() < 0.5 \
+            else self.rng.randint(1, self.max_product_id)
+
+    async def list_products(self):
+        params = {"page": self.rng.randint(1, 20), "page_size": 20}
+        if self.rng.random() < 0.5:
+            params["category"] = self.rng.choice(CATEGORIES)
+        if self.rng.random() < 0.3:
+            params["sort_by"] = self.rng.choice(["price", "name"])
+        if self.rng.random() < 0.2:
+            params["min_price"], params["max_price"] = 10, 100
+        await self.request("GET /products/", "GET", "/products/", params=params)
+
+    async def product_detail(self):
+        await self.request("GET /products/{id}", "GET", f"/products/{self.product_id()}")
+
+    async def search(self):
+        await self.request("GET /products/search", "GET", "/products/search",
+                           params={"keyword": self.rng.choice(KEYWORDS)})
+
+    async def add_to_cart(self):
+        await self.request("POST /cart/add", "POST", "/cart/add",
+                           json={"product_id": self.product_id(), "quantity": 1})
+
+    async def view_cart(self):
+        await self.request("GET /cart", "GET", "/cart")
+
+    async def checkout(self):
+        for _ in range(self.rng.randint(1, 3)):
+            await self.add_to_cart()
+        await self.request("POST /checkout", "POST", "/checkout")
+
+    async def order_history(self):
+        await self.request("GET /orders", "GET", "/orders")
+
+
+SCENARIOS = {
+    "browse": [(6, VirtualUser.list_products), (4, VirtualUser.product_detail)],
+    "search": [(1, VirtualUser.search)],
+    "cart": [(3, VirtualUser.add_to_cart), (2, VirtualUser.view_cart)],
+    "checkout": [(1, VirtualUser.checkout)],
+    "mixed": [
+        (40, VirtualUser.list_products),
+        (30, VirtualUser.product_detail),
+        (15, VirtualUser.search),
+        (6, VirtualUser.add_to_cart),
+        (4, VirtualUser.view_cart),
+        (3, VirtualUser.order_history),
+        (2, VirtualUser.checkout),
+    ],
+}
+
+
+async def run_user(user, steps, deadline):
+    weights = [weight for weight, _ in steps]
+    actions = [action for _, action in steps]
+    while time.perf_counter() < deadline:
+        action = user.rng.choices(actions, weights)[0]
+        await action(user)
+
+
+def discover_ids():
+    with engine.connect() as conn:
+        max_product_id = conn.execute(select(func.max(Product.id))).scalar()
+        user_count = conn.execute(select(func.count()).select_from(User)).scalar()
+    if not max_product_id or not user_count:
+        raise SystemExit("No seeded data found; run `python -m benchmarks.seed` first.")
+    return max_product_id, user_count
+
+
+async def run(args):
+    max_product_id, user_count = discover_ids()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from main import app
+        from app.core.config import settings
+        # Signin throttling is benchmarked by login_storm; here it would only
+        # stall the warm-up, since every virtual user shares one client address.
+        settings.rate_limit_enabled = False
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                   timeout=args.timeout)
+
+    recorder = Recorder()
+    async with client:
+        users = []
+        for n in range(args.concurrency):
+            user = VirtualUser(client, recorder, random.Random(args.seed + n), max_product_id)
+            # bench0 is the admin; customers start at bench1.
+            await user.sign_in(f"bench{1 + n % max(1, user_count - 1)}@gmail.com", args.password)
+            users.append(user)
+
+        recorder = Recorder()
+        for user in users:
+            user.recorder = recorder
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(run_user(user, SCENARIOS[args.scenario], deadline) for user in users))
+        recorder.stop()
+
+    return {
+        "meta": run_metadata(
+            scenario=args.scenario,
+            concurrency=args.concurrency,
+            duration_s=args.duration,
+            target=args.url or "in-process",
+            seed=args.seed,
+        ),
+        **recorder.report(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--url", help="base URL of a running server; default drives the app in-process")
+    parser.add_argument("--password", default="benchmark123")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Login storm: sign-in throughput and its effect on catalog latency.
+
+Runs ``--logins`` virtual users that call ``POST /auth/signin`` back to back
+as the seeded ``bench<n>@gmail.com`` accounts, alongside ``--browsers``
+virtual users that keep reading the public catalog. The report has the
+usual per-endpoint latency percentiles plus sign-ins/s, the number of
+sign-ins shed with 503 by the password-hashing pool, and the p99 of the
+non-auth endpoints, which is the number this benchmark exists to protect.
+
+    python -m benchmarks.login_storm --logins 50 --browsers 20 --duration 30 --output storm.json
+    python -m benchmarks.login_storm --url http://127.0.0.1:8000
+
+Seed the database first with ``python -m benchmarks.seed``.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.common import Recorder, percentile, run_metadata, write_report
+from benchmarks.load import SCENARIOS, VirtualUser, discover_ids, run_user
+
+SIGNIN = "POST /auth/signin"
+
+
+async def storm(client, recorder, rng, user_count, password, deadline):
+    while time.perf_counter() < deadline:
+        email = f"bench{rng.randint(1, max(1, user_count - 1))}@gmail.com"
+        started = time.perf_counter()
+        try:
+            response = await client.post("/auth/signin", json={"email": email, "password": password})
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, "error"
+        recorder.record(SIGNIN, time.perf_counter() - started, status)
+        if status in (429, 503):
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+
+async def run(args):
+    max_product_id, user_count = discover_ids()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.logins + args.browsers))
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                   timeout=args.timeout)
+
+    recorder = Recorder()
+    async with client:
+        browsers = [
+            VirtualUser(client, recorder, random.Random(args.seed + n), max_product_id)
+            for n in range(args.browsers)
+        ]
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *(storm(client, recorder, random.Random(args.seed - n - 1), user_count, args.password, deadline)
+              for n in range(args.logins)),
+            *(run_user(user, SCENARIOS["browse"], deadline) for user in browsers),
+        )
+        recorder.stop()
+    if not args.url:
+        from app.auth.hashing import hasher
+        hasher.shutdown()
+
+    report = recorder.report()
+    signins = report["endpoints"].get(SIGNIN, {"statuses": {}})
+    other = sorted(v for name, values in recorder.latencies.items() if name != SIGNIN for v in values)
+    return {
+        "meta": run_metadata(
+            logins=args.logins,
+            browsers=args.browsers,
+            duration_s=args.duration,
+            target=args.url or "in-process",
+            seed=args.seed,
+        ),
+        "signins_per_s": signins["statuses"].get("200", 0) / report["elapsed_s"],
+        "signins_rejected": signins["statuses"].get("503", 0),
+        "signins_throttled": signins["statuses"].get("429", 0),
+        "other_p99_ms": percentile(other, 99) * 1000,
+        **report,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50, help="concurrent sign-in loops")
+    parser.add_argument("--browsers", type=int, default=20, help="concurrent catalog readers")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--url", help="base URL of a running server; default drives the app in-process")
+    parser.add_argument("--password", default="benchmark123")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
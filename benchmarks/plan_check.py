@@ -0,0 +1,118 @@
+"""Query-plan regression check: no sequential scans on large tables.
+
+Runs ``EXPLAIN (FORMAT JSON)`` on the main statement behind each router's
+hot paths, with parameters picked from the seeded data, and fails (exit code
+1) if any plan contains a ``Seq Scan`` on a table whose planner row estimate
+is at least ``--min-rows``. Small tables are left alone; scanning them is
+often the right plan.
+
+Needs a seeded, analyzed local Postgres:
+
+    alembic upgrade head
+    python -m benchmarks.seed --truncate
+    psql -c 'ANALYZE'
+    python -m benchmarks.plan_check --min-rows 10000
+"""
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import select, text, tuple_
+
+from app.auth.models import EmailOutbox, EmailStatusEnum, PasswordResetToken, RefreshToken, User
+from app.cart.models import Carts
+from app.core.database import engine
+from app.orders.models import Order, OrderItem
+from app.products import search
+from app.products.models import Product
+
+
+def sample(conn):
+    """Representative parameter values taken from the seeded data."""
+    user_id = conn.execute(select(Order.user_id).where(Order.user_id.is_not(None)).limit(1)).scalar() or 1
+    order_id = conn.execute(select(Order.id).where(Order.user_id == user_id).limit(1)).scalar() or 1
+    product = conn.execute(select(Product.id, Product.category, Product.price, Product.name).limit(1)).first()
+    email = conn.execute(select(User.email).where(User.id == user_id)).scalar() or "bench1@gmail.com"
+    return user_id, order_id, product, email
+
+
+def statements(user_id, order_id, product, email):
+    digest = hashlib.sha256(b"plan-check").digest()
+    ranked, rank = search.ranked_query("lamp")
+    return {
+        "GET /products/ (category, sort_by=price)":
+            select(Product).where(Product.category == product.category)
+            .order_by(Product.price, Product.id).offset(200).limit(20),
+        "GET /products/ (cursor, sort_by=name)":
+            select(Product).where(tuple_(Product.name, Product.id) > tuple_(product.name, product.id))
+            .order_by(Product.name, Product.id).limit(20),
+        "GET /products/ (cursor, price range)":
+            select(Product).where(Product.price >= 10, Product.price <= 100,
+                                  tuple_(Product.price, Product.id) > tuple_(product.price, product.id))
+            .order_by(Product.price, Product.id).limit(20),
+        "GET /products/search": ranked.order_by(rank.desc(), Product.id).limit(10),
+        "GET /products/{id}": select(Product).where(Product.id == product.id),
+        "POST /auth/signin": select(User).where(User.email == email),
+        "POST /auth/refresh": select(RefreshToken).where(RefreshToken.token_hash == digest),
+        "POST /auth/reset-password": select(PasswordResetToken.user_id).where(
+            PasswordResetToken.token_hash == digest, PasswordResetToken.used == False,
+            PasswordResetToken.expiration_time > datetime.utcnow()),
+        "POST /cart/add": select(Carts).where(Carts.user_id == user_id, Carts.product_id == product.id),
+        "GET /cart": select(Carts, Product).join(Product, Product.id == Carts.product_id)
+            .where(Carts.user_id == user_id),
+        "GET /orders": select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc()),
+        "GET /orders/{id} (items)": select(OrderItem).where(OrderItem.order_id == order_id),
+        "DELETE /admin/products/{id} (in-order check)":
+            select(OrderItem.id).where(OrderItem.product_id == product.id).limit(1),
+        "email outbox (due batch)": select(EmailOutbox).where(
+            EmailOutbox.status == EmailStatusEnum.pending, EmailOutbox.next_attempt_at <= datetime.utcnow())
+            .order_by(EmailOutbox.id).limit(50),
+    }
+
+
+def seq_scans(plan):
+    """Relation names of every Seq Scan node in an EXPLAIN JSON plan."""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="tables with at least this many (estimated) rows must not be seq-scanned")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("plan_check needs DATABASE_URL to point at PostgreSQL")
+
+    failures = []
+    with engine.connect() as conn:
+        table_rows = dict(conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )).all())
+        for name, stmt in statements(*sample(conn)).items():
+            compiled = stmt.compile(dialect=conn.dialect)
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            offenders = sorted({t for t in seq_scans(root) if table_rows.get(t, 0) >= args.min_rows})
+            status = "FAIL" if offenders else "ok"
+            print(f"{status:4}  {name}" + (f"  seq scan on {', '.join(offenders)}" if offenders else ""))
+            if args.verbose:
+                print(json.dumps(root, indent=2))
+            if offenders:
+                failures.append(name)
+
+    if failures:
+        print(f"\n{len(failures)} statement(s) seq-scan a table with >= {args.min_rows} rows", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
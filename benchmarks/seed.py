@@ -0,0 +1,180 @@
+"""Bulk-generate a synthetic catalog, users, carts and orders.
+
+Rows are written with Core executemany in chunks against the tables the
+Alembic revisions create, so millions of products load in minutes rather
+than going through the ORM one object at a time. Generation is seeded, so
+the same arguments produce the same data set across commits.
+
+    python -m benchmarks.seed --users 10000 --products 1000000 --carts 2000 --orders 50000
+
+Every generated user can sign in with ``--password`` (default
+``benchmark123``); emails are ``bench<n>@gmail.com``.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from app.auth import utils
+from app.auth.models import EmailOutbox, PasswordResetToken, RefreshToken, RoleEnum, TokenRevocation, User
+from app.cart.models import Carts
+from app.core.database import Base, engine
+from app.orders.models import Order, OrderItem, OrderStatusEnum
+from app.products import facets
+from app.products.models import Product, ProductFacet
+
+logger = logging.getLogger("benchmarks.seed")
+
+CATEGORIES = [
+    "electronics", "books", "clothing", "home", "garden", "toys", "sports",
+    "beauty", "grocery", "automotive", "music", "office", "pets", "health",
+]
+ADJECTIVES = [
+    "compact", "deluxe", "classic", "wireless", "organic", "premium", "portable",
+    "smart", "vintage", "ergonomic", "eco", "rugged", "slim", "ultra", "modern",
+]
+NOUNS = [
+    "lamp", "speaker", "backpack", "kettle", "notebook", "jacket", "headphones",
+    "blender", "chair", "watch", "camera", "sneakers", "mug", "drone", "keyboard",
+    "tent", "guitar", "router", "puzzle", "shampoo",
+]
+COLORS = ["black", "white", "red", "blue", "green", "silver", "gold", "grey"]
+
+
+def chunked_insert(conn, table, rows, chunk_size):
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def generate_users(rng, count, hashed_password):
+    for n in range(count):
+        yield {
+            "name": f"Bench User {n}",
+            "email": f"bench{n}@gmail.com",
+            "hashed_password": hashed_password,
+            "role": RoleEnum.admin if n == 0 else RoleEnum.user,
+        }
+
+
+def generate_products(rng, count):
+    for n in range(count):
+        adjective = rng.choice(ADJECTIVES)
+        noun = rng.choice(NOUNS)
+        color = rng.choice(COLORS)
+        yield {
+            "name": f"{adjective.title()} {color} {noun} {n}",
+            "description": f"A {adjective} {color} {noun} for everyday use.",
+            "price": round(rng.lognormvariate(3.5, 0.9), 2),
+            "stock": rng.randint(0, 500) if rng.random() < 0.05 else rng.randint(50, 5000),
+            "category": rng.choice(CATEGORIES),
+            "image_url": f"https://cdn.example.com/p/{n}.jpg",
+        }
+
+
+def generate_carts(rng, user_ids, product_ids, count):
+    for user_id in rng.sample(user_ids, min(count, len(user_ids))):
+        for product_id in rng.sample(product_ids, rng.randint(1, 5)):
+            yield {"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+
+
+def seed_orders(conn, rng, user_ids, product_prices, count, chunk_size):
+    product_ids = list(product_prices)
+    now = datetime.utcnow()
+    written = 0
+    while written < count:
+        batch = min(chunk_size, count - written)
+        orders, lines = [], []
+        for _ in range(batch):
+            total = 0.0
+            order_lines = []
+            for product_id in rng.sample(product_ids, rng.randint(1, 4)):
+                quantity = rng.randint(1, 3)
+                price = product_prices[product_id]
+                total += price * quantity
+                order_lines.append({"product_id": product_id, "quantity": quantity, "price_at_purchase": price})
+            orders.append({
+                "user_id": rng.choice(user_ids),
+                "total_amount": round(total, 2),
+                "status": OrderStatusEnum.paid,
+                "created_at": now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+            })
+            lines.append(order_lines)
+
+        order_ids = conn.execute(
+            insert(Order.__table__).returning(Order.id, sort_by_parameter_order=True), orders
+        ).scalars().all()
+        conn.execute(insert(OrderItem.__table__), [
+            {"order_id": order_id, **line}
+            for order_id, order_lines in zip(order_ids, lines)
+            for line in order_lines
+        ])
+        written += batch
+    return written
+
+
+def truncate(conn):
+    for model in (OrderItem, Order, Carts, ProductFacet, Product,
+                  RefreshToken, TokenRevocation, PasswordResetToken, EmailOutbox, User):
+        conn.execute(delete(model.__table__))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--carts", type=int, default=200, help="users that get a populated cart")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="benchmark123")
+    parser.add_argument("--truncate", action="store_true", help="delete existing rows first")
+    parser.add_argument("--create-schema", action="store_true",
+                        help="create tables from the models (SQLite/dev only; use alembic otherwise)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    rng = random.Random(args.seed)
+    if args.create_schema:
+        Base.metadata.create_all(engine)
+
+    hashed_password = utils.hash_password(args.password)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if args.truncate:
+            truncate(conn)
+
+        n = chunked_insert(conn, User.__table__, generate_users(rng, args.users, hashed_password), args.chunk_size)
+        logger.info("users: %d", n)
+        n = chunked_insert(conn, Product.__table__, generate_products(rng, args.products), args.chunk_size)
+        logger.info("products: %d", n)
+
+        user_ids = list(conn.execute(select(User.id).where(User.role == RoleEnum.user)).scalars())
+        product_prices = dict(conn.execute(select(Product.id, Product.price)).all())
+        product_ids = list(product_prices)
+
+        n = chunked_insert(conn, Carts.__table__, generate_carts(rng, user_ids, product_ids, args.carts), args.chunk_size)
+        logger.info("cart lines: %d", n)
+        n = seed_orders(conn, rng, user_ids, product_prices, args.orders, args.chunk_size)
+        logger.info("orders: %d", n)
+
+    # Core inserts bypass the facet bookkeeping of the product routes.
+    logger.info("facet buckets: %d", asyncio.run(facets.rebuild_table()))
+    logger.info("seeded in %.1fs", time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
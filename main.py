@@ -1,29 +1,62 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import logging
 #from app.core.database import engine, Base
 #import app.models  
 
-from app.auth.routes import router as auth_router
+from app.auth.routes import router as auth_router, admin_router as user_admin_router
+from app.auth.revocation import revoked
+from app.auth.email_outbox import outbox
+from app.auth.purge import purger
 from app.products.routes import router as product_admin_router
-from app.products import public_routes
+from app.products import autocomplete, public_routes
 from app.cart.routes import router as cart_router
 from app.checkout import routes as checkout_routes
 from app.orders.routes import router as order_router
+from app.monitoring.routes import router as monitoring_router, metrics_router
+from app.monitoring.metrics import MetricsMiddleware, mark_worker_dead
+from app.core.database import async_engine, async_read_engine
+from app.auth.hashing import hasher
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await revoked.load()
+    revoked.start()
+    outbox.start()
+    purger.start()
+    autocomplete.index.start()
+    yield
+    await autocomplete.index.stop()
+    await purger.stop()
+    await outbox.stop()
+    await revoked.stop()
+    for engine in (async_engine, async_read_engine):
+        if engine is not None:
+            await engine.dispose()
+    hasher.shutdown()
+    mark_worker_dead()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Server is running!"}
 
 # Base.metadata.create_all(bind=engine)
 
 app.include_router(auth_router)
+app.include_router(user_admin_router)
 app.include_router(product_admin_router)
 app.include_router(public_routes.router)
 app.include_router(cart_router)
 app.include_router(checkout_routes.router)
 app.include_router(order_router)
+app.include_router(monitoring_router)
+app.include_router(metrics_router)
 
 logging.basicConfig(
     level=logging.INFO,